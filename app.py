@@ -1,16 +1,26 @@
-from flask import Flask, request, send_file, abort, render_template, redirect
+from flask import (
+    Flask,
+    Response,
+    request,
+    send_file,
+    abort,
+    render_template,
+    redirect,
+    jsonify,
+    stream_with_context,
+)
 from flask_cors import CORS
-from threading import Thread
-from modules.flows import main
+from queue import Full
+from modules.flows import main, configs
+from modules.job_manager import JobManager
 import os
+import json
 import logging
 import requests
 from datetime import datetime
 
 REACT_PORT = os.environ.get("NEWS_EXTRACTOR_REACT_PORT")
 NODE_PORT = os.environ.get("NEWS_EXTRACTOR_NODE_PORT")
-SERVICE_THREAD = None
-LAST_THREAD = None
 formatted_datetime = datetime.now().strftime("%d_%m_%Y-%H_%M_%S")
 os.makedirs('logs',exist_ok=True)
 logging.basicConfig(
@@ -27,7 +37,12 @@ CORS(app, expose_headers=["Content-Disposition"])
 # Initialize CORS extension with app and specify allowed origins
 CORS(app, resources={r"/extract-news": {"origins": f"http://localhost:{REACT_PORT}"}})
 
-shared = {"latest_file_path": None}
+# several analysts can run extractions at once, each request is its own job
+job_manager = JobManager(
+    main,
+    max_concurrent_jobs=configs.get("max_concurrent_jobs", 2),
+    max_queued_jobs=configs.get("max_queued_jobs", 10),
+)
 react_url = f"http://localhost:{REACT_PORT}".strip()
 node_url = f"http://localhost:{NODE_PORT}".strip()
 
@@ -77,35 +92,94 @@ def check_react_status():
 
 @app.route("/extract-news", methods=["POST"])
 def extract_news_for():
-    global SERVICE_THREAD, LAST_THREAD
     # Access the data sent with the POST request
     logging.info(request.json)
     query_params = request.json.get("site_data")
     # print(query_params)
-    if query_params:
-        if SERVICE_THREAD:
-            LAST_THREAD[1].append(1)
-        shared["latest_file_path"] = None
-        kill_thread = []
-        SERVICE_THREAD = Thread(target=main, args=(query_params, kill_thread, shared))
-        SERVICE_THREAD.daemon = True
-        SERVICE_THREAD.start()
-        LAST_THREAD = SERVICE_THREAD, kill_thread
-        # main(urls, session_id, from_date, to_date)
-        # else:
-        #     abort(404)
-    return "OK"
+    if not query_params:
+        abort(400)
+    try:
+        job = job_manager.submit(
+            query_params,
+            fetch_backend=request.json.get("fetch_backend"),
+            output_format=request.json.get("output_format"),
+            incremental=request.json.get("incremental"),
+        )
+    except Full:
+        logging.warning("Job queue is full, rejecting extraction request")
+        abort(429)
+    return jsonify(job.to_dict())
+
+
+def get_requested_job():
+    # ?job=<id> picks a job. Without it the latest finished job is used, as the
+    # UI polling /get-file-path still expects. Jobs are not tied to a user
+    job_id = request.args.get("job")
+    job = job_manager.get(job_id) if job_id else job_manager.latest_finished()
+    if job is None:
+        abort(404)
+    return job
+
+
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify([job.to_dict() for job in job_manager.list()])
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job.to_dict())
+
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def stream_job_events(job_id):
+    # server sent events of the job's progress, ends after its final status event.
+    # Reconnecting clients resume after the Last-Event-ID they received
+    job = job_manager.get(job_id)
+    if job is None:
+        abort(404)
+    last_event_id = request.headers.get("Last-Event-ID", request.args.get("after", ""))
+    start = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+
+    def events():
+        for item in job.progress.follow(start):
+            if item is None:
+                # keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            index, event = item
+            yield f"id: {index}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job.to_dict())
 
 
 @app.route("/get-file-path", methods=["GET"])
 def get_latest_file_path():
-    return shared["latest_file_path"] if shared["latest_file_path"] else ""
+    job_id = request.args.get("job")
+    job = job_manager.get(job_id) if job_id else job_manager.latest_finished()
+    return job.file_path if job and job.file_path else ""
 
 
 @app.route("/get-file")
 def download_file():
-    shared["latest_file_path"] if shared["latest_file_path"] else abort(404)
-    return send_file(shared["latest_file_path"], as_attachment=True)
+    job = get_requested_job()
+    job.file_path if job.file_path else abort(404)
+    return send_file(job.file_path, as_attachment=True)
 
 
 # Run the Flask app
@@ -0,0 +1,60 @@
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from modules.output_manager import OutputManager
+
+# python benchmark_finalize.py [rows ...]
+# times OutputManager.finalize_session_data on synthetic sessions, every url is
+# listed ~3 times (pages and sites overlapping) and every row has a date, so no
+# date reconcilation requests are made
+sizes = [int(size) for size in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+sites = [
+    "https://www.ft.com/markets",
+    "https://www.reuters.com/markets/funds/",
+    "https://www.hl.co.uk/news/tags/funds",
+    "https://www.etfstream.com/news",
+]
+keywords = ["", "", "fund", "etf", "fund:etf", "bond", "trust"]
+
+
+def make_session(output_manager, rows):
+    random.seed(rows)
+    start = datetime(2024, 1, 1)
+    data = []
+    for _ in range(rows):
+        article = random.randrange(rows // 3 or 1)
+        site = random.choice(sites)
+        data.append(
+            (
+                site,
+                (start - timedelta(days=article % 365)).strftime("%B %d, %Y"),
+                f"Title {article}",
+                random.choice(["", "Jane Doe", "John Doe"]),
+                f"https://example.com/article/{article}",
+                "",
+                random.choice(keywords),
+                random.choice(keywords),
+                site,
+            )
+        )
+    output_manager.append_file("0", data)
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as folder:
+        output_manager = OutputManager(
+            {"output_folder": folder, "staging_folder": folder}, "benchmark"
+        )
+        for rows in sizes:
+            make_session(output_manager, rows)
+            df = output_manager.session_store.to_dataframe()
+            output_manager.session_store.clear()
+            started = time.perf_counter()
+            deduplicated = output_manager.finalize_session_data(df)
+            taken = time.perf_counter() - started
+            print(
+                f"rows: {rows:>9,} urls: {len(deduplicated):>9,} finalize: {taken:7.2f}s"
+            )
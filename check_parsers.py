@@ -0,0 +1,450 @@
+import ast
+import html
+import itertools
+import json
+import random
+import re
+import sys
+import tempfile
+
+from bs4 import BeautifulSoup
+from requests.models import Response
+
+from modules.keywords_manager import KeywordIndex
+from modules.output_manager import OutputManager
+from modules.url_parser import (
+    COMPOUND_SELECTOR_TOKEN,
+    UrlParser,
+    _split_selector_list,
+    resolve_html_parser,
+    selector_strainer,
+)
+
+# python check_parsers.py [page.html ...]
+# checks that a page parsed with only the subtrees its selectors can match
+# (UrlParser(selectors=...)) answers get_from_selector the same as a full parse,
+# for every selector tuple the site functions in modules/flows.py pass on.
+# Each site is checked on a page generated from its selectors, with decoys that
+# the strainer has to drop, and on every saved page given on the command line.
+# Sites with a json listing endpoint are checked the same way against the html
+# tree UrlParser used to build from the json, on a generated payload and on every
+# saved .json file given.
+# Last, KeywordIndex.match_keywords and match_keywords_many are checked against
+# the per keyword \b regex loop they replaced, on generated keywords and texts.
+FLOWS_PATH = "modules/flows.py"
+LISTING_FIELDS = (
+    "title_selector",
+    "link_selector",
+    "date_selector",
+    "get_next_page_selector",
+    "get_max_page_selector",
+)
+ARTICLE_FIELDS = ("title_body_selector", "author_selector")
+INLINE_TAGS = {"a", "span", "p", "h1", "h2", "h3", "h4", "h5", "h6", "time", "li"}
+TABLE_TAGS = {"td", "th"}
+
+
+def flows_selectors(path=FLOWS_PATH):
+    # {site function: {"url": market url, "listing": [...], "article": [...]}}
+    with open(path, "r", encoding="utf-8") as fp:
+        tree = ast.parse(fp.read())
+    sites = {}
+    for function in tree.body:
+        if not isinstance(function, ast.FunctionDef):
+            continue
+        nodes = sorted(
+            (node for node in ast.walk(function) if hasattr(node, "lineno")),
+            key=lambda node: (node.lineno, node.col_offset),
+        )
+        names = {}
+        site = {"url": None, "listing": [], "article": []}
+
+        def resolve(node):
+            if isinstance(node, ast.Constant):
+                return node.value
+            if isinstance(node, ast.Name):
+                return names.get(node.id)
+            raise ValueError(f"{function.name}: can not resolve {ast.dump(node)}")
+
+        for node in nodes:
+            if isinstance(node, ast.Assign) and isinstance(node.value, (ast.Constant, ast.Name)):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        names[target.id] = resolve(node.value)
+                        if target.id == "market_url" and not site["url"]:
+                            site["url"] = names[target.id]
+            elif isinstance(node, ast.Call):
+                for keyword in node.keywords:
+                    if keyword.arg in LISTING_FIELDS + ARTICLE_FIELDS and isinstance(
+                        keyword.value, ast.Tuple
+                    ):
+                        selector = tuple(resolve(elt) for elt in keyword.value.elts)
+                        kind = "article" if keyword.arg in ARTICLE_FIELDS else "listing"
+                        site[kind].append(selector)
+                    elif keyword.arg == "selectors" and isinstance(keyword.value, ast.List):
+                        site["article"].extend(
+                            tuple(resolve(elt) for elt in item.elts)
+                            for item in keyword.value.elts
+                        )
+        site["listing"] = [selector for selector in site["listing"] if selector[1]]
+        if site["listing"] or site["article"]:
+            sites[function.name] = site
+    return sites
+
+
+def _complex_selector(group):
+    # "a > b c" -> [("a", ">"), ("b", " "), ("c", None)]
+    parts, compound, depth, ind = [], "", 0, 0
+    while ind < len(group):
+        char = group[ind]
+        depth += {"(": 1, "[": 1, ")": -1, "]": -1}.get(char, 0)
+        if not depth and (char.isspace() or char in ">~+"):
+            rest = group[ind:].lstrip()
+            combinator = rest[0] if rest[0] in ">~+" else " "
+            rest = rest[1:].lstrip() if combinator != " " else rest
+            if compound:
+                parts.append((compound, combinator))
+            compound, ind = "", len(group) - len(rest)
+            continue
+        compound += char
+        ind += 1
+    parts.append((compound, None))
+    return parts
+
+
+def _element(compound, text, inline=False):
+    # opening tag, closing tag and extra content of an element matching compound
+    tag, attrs, content = None, {}, ""
+    plain = compound
+    while ":" in plain:
+        start = plain.index(":")
+        end, depth = start, 0
+        while end < len(plain):
+            depth += {"(": 1, ")": -1}.get(plain[end], 0)
+            end += 1
+            if not depth and plain[end - 1] == ")":
+                break
+        pseudo = plain[start:end]
+        argument = pseudo[pseudo.find("(") + 1 : -1].strip("'\"")
+        if "contains" in pseudo:
+            content += f" {argument} "
+        elif pseudo.startswith(":has("):
+            content += generate_fragment(argument, text)
+        plain = plain[:start] + plain[end:]
+    for token in COMPOUND_SELECTOR_TOKEN.finditer(plain):
+        if token["tag"]:
+            tag = None if token["tag"] == "*" else token["tag"]
+        elif token["id"]:
+            attrs["id"] = token["id"]
+        elif token["cls"]:
+            attrs["class"] = f"{attrs.get('class', '')} {token['cls']}".strip()
+        else:
+            value = (token["val"] or "").strip("'\"")
+            attrs[token["attr"]] = {
+                "*=": f"x-{value}-x",
+                "^=": f"{value}-x",
+                "$=": f"x-{value}",
+                "~=": f"x {value}",
+                "|=": f"{value}-x",
+            }.get(token["op"], value)
+    tag = tag or ("span" if inline else "div")
+    if tag == "a" and "href" not in attrs:
+        attrs["href"] = f"/article/{text}"
+    rendered = "".join(f' {name}="{value}"' for name, value in attrs.items())
+    opening, closing = f"<{tag}{rendered}>", f"</{tag}>"
+    if tag in TABLE_TAGS:
+        opening, closing = f"<table><tr>{opening}", f"{closing}</tr></table>"
+    return tag, opening, closing, content
+
+
+def generate_fragment(selector, text, inner="", decoy=False):
+    # html matching every group of selector once, inner inside each match.
+    # decoy: the same markup with the first compound replaced, which a
+    # strainer built from selector has to drop.
+    html = ""
+    for group in _split_selector_list(selector or ""):
+        parts = _complex_selector(group)
+        if decoy:
+            parts[0] = ("section", parts[0][1])
+
+        def render(ind, inline=False):
+            compound, combinator = parts[ind]
+            tag, opening, closing, content = _element(compound, f"{text}-{ind}", inline)
+            inline = inline or tag in INLINE_TAGS
+            wrapper = "span" if inline else "div"
+            if combinator is None:
+                return f"{opening}{content}{text} {group}{inner}{closing}"
+            if combinator == " ":
+                return f"{opening}{content}<{wrapper}>{render(ind + 1, inline)}</{wrapper}>{closing}"
+            if combinator == ">":
+                return f"{opening}{content}{render(ind + 1, inline)}{closing}"
+            gap = f"<{wrapper}>gap</{wrapper}>" if combinator == "~" else ""
+            return f"{opening}{content}{text}{closing}{gap}{render(ind + 1, inline)}"
+
+        html += render(0)
+    return html
+
+
+def generate_page(selectors):
+    counter = itertools.count()
+    body = ""
+    for parent_selector, selector in selectors:
+        for decoy in (False, True, False):
+            text = f"t{next(counter)}"
+            if parent_selector:
+                inner = generate_fragment(selector, f"{text}c")
+                body += generate_fragment(parent_selector, text, inner, decoy)
+                body += generate_fragment(selector, f"{text}o", decoy=decoy)
+            else:
+                body += generate_fragment(selector, text, decoy=decoy)
+    return (
+        "<!DOCTYPE html><html><head><title>page</title>"
+        "<style>p { color: red }</style>"
+        "<script>var html = '<p class=\"author\">script</p>';</script></head>"
+        "<body><nav><a href='/'>home</a><p>nav</p></nav><!-- <p>comment</p> -->"
+        f"<main>{body}</main><footer><p>footer</p></footer></body></html>"
+    )
+
+
+def make_response(content, content_type="text/html; charset=utf-8"):
+    response = Response()
+    response.status_code = 200
+    response._content = content.encode("utf-8")
+    response.encoding = "utf-8"
+    response.headers["Content-Type"] = content_type
+    return response
+
+
+def parse(url, response, selectors=None):
+    url_parser = UrlParser(url, load=False, selectors=selectors)
+    url_parser.soup = url_parser._make_soup(response)
+    return url_parser
+
+
+def answers(url_parser, selectors):
+    results = []
+    for parent_selector, selector in selectors:
+        for get in ("text", "href"):
+            try:
+                results.append(url_parser.get_from_selector(parent_selector, selector, get=get))
+            except Exception as e:
+                results.append(f"{type(e).__name__}: {e}")
+    return results
+
+
+def _href(value):
+    return f' href="{html.escape(value)}"' if isinstance(value, str) else ""
+
+
+def json_to_html(data):
+    # UrlParser._json_to_html as it was replaced, with the two documented fixes:
+    # one li per scalar list item, and string values standing in for href.
+    # Values are escaped, the old string concatenation broke on "<" and "&".
+    html_output = "<ul>"
+    for key, value in data.items():
+        html_output += f"<{key}{_href(value)}>"
+        if isinstance(value, dict):
+            html_output += json_to_html(value)
+        elif isinstance(value, list):
+            html_output += "<ul>"
+            for item in value:
+                if isinstance(item, dict):
+                    html_output += json_to_html(item)
+                elif isinstance(item, list):
+                    html_output += json_to_html({"list_item": item})
+                else:
+                    html_output += f"<li{_href(item)}>{html.escape(str(item))}</li>"
+            html_output += "</ul>"
+        else:
+            html_output += html.escape(str(value))
+        html_output += f"</{key}>"
+    html_output += "</ul>"
+    return html_output
+
+
+def generate_payload(articles=5):
+    # shaped like the reuters articles-by-section-alias-or-id-v1 response
+    return {
+        "statusCode": 200,
+        "message": "Success",
+        "result": {
+            "parent_section_name": "Markets",
+            "articles": [
+                {
+                    "id": f"ID{ind}",
+                    "canonical_url": f"/markets/funds/article-{ind}/",
+                    "title": f"Fund flows & yields <{ind}>",
+                    "description": f"Description {ind}",
+                    "display_time": f"2024-01-{ind + 1:02d}T10:00:00Z",
+                    "word_count": 100 * ind,
+                    "premium": ind % 2 == 0,
+                    "thumbnail": None if ind % 2 else {"url": f"/image-{ind}.jpg", "width": 640},
+                    "authors": [
+                        {"name": f"Author {ind}", "byline": "By", "topic_url": f"/authors/{ind}/"},
+                        {"name": f"Second {ind}", "byline": "By"},
+                    ][: ind % 2 + 1],
+                    "kicker": {"name": "Funds", "names": ["Funds", f"Kicker {ind}"]},
+                    "ad_topics": [["fund", "etf"], [f"topic {ind}"]],
+                }
+                for ind in range(articles)
+            ],
+            "pagination": {"size": articles, "expected_size": articles, "total_size": 1000},
+        },
+    }
+
+
+def json_selectors(data, parents=()):
+    # a plain, a descendant and a child selector for every key of data
+    selectors = []
+    if isinstance(data, dict):
+        for key, value in data.items():
+            key = key.lower()
+            selectors.append((None, key))
+            if parents:
+                selectors.append((None, f"{parents[-1]} {key}"))
+                selectors.append((parents[-1], key))
+            selectors += json_selectors(value, parents + (key,))
+    elif isinstance(data, list):
+        for item in data:
+            selectors += json_selectors(item, parents)
+        if parents and any(not isinstance(item, (dict, list)) for item in data):
+            selectors.append((None, f"{parents[-1]} > ul > li"))
+    return list(dict.fromkeys(selectors))
+
+
+def check_json(name, url, data, selectors):
+    # returns (failures, matched) for one payload against the old html tree
+    failures, matched = [], 0
+    url_parser = parse(url, make_response(json.dumps(data), "application/json"))
+    reference = UrlParser(url, load=False)
+    reference.soup = BeautifulSoup(json_to_html(data), "html.parser")
+    pairs = [(*pair, get) for pair in selectors for get in ("text", "href")]
+    for (parent_selector, selector, get), expected, got in zip(
+        pairs, answers(reference, selectors), answers(url_parser, selectors)
+    ):
+        matched += get == "text" and isinstance(expected, list) and any(expected)
+        if expected != got:
+            failures.append(
+                f"{name} ({parent_selector!r}, {selector!r}) get={get}:"
+                f" html tree {expected!r} != json {got!r}"
+            )
+    return failures, matched
+
+
+def check_page(name, url, html, selectors):
+    # returns (failures, matched) for one page parsed by every installed parser
+    failures, matched = [], 0
+    response = make_response(html)
+    for html_parser in dict.fromkeys(("lxml", "html.parser")):
+        if resolve_html_parser(html_parser) != html_parser:
+            continue
+        UrlParser.html_parser = html_parser
+        full = answers(parse(url, response), selectors)
+        strained = answers(parse(url, response, selectors), selectors)
+        pairs = [(*pair, get) for pair in selectors for get in ("text", "href")]
+        for (parent_selector, selector, get), expected, got in zip(pairs, full, strained):
+            matched += get == "text" and isinstance(expected, list) and any(expected)
+            if expected != got:
+                failures.append(
+                    f"{name} [{html_parser}] ({parent_selector!r}, {selector!r}) get={get}:"
+                    f" full {expected!r} != strained {got!r}"
+                )
+    return failures, matched
+
+
+def match_keywords_regex(keywords, text):
+    # KeywordsManager.match_keywords before the Aho-Corasick matcher
+    return ":".join(
+        keyword
+        for keyword in keywords
+        if re.search(r"\b" + re.escape(keyword.lower()) + r"\b", text.lower())
+    )
+
+
+def check_keywords(rounds=200, seed=0):
+    random.seed(seed)
+    # word and non word characters, and ones that change length or class when lowercased
+    alphabet = "abfnu_1 -&.+'\n" + "éßİΣǅ²٣\u0301"
+    words = ["fund", "funds", "fund manager", "s&p 500", "c++", "a.i.", "etf", "-etf", "i", ""]
+    failures = 0
+    for _ in range(rounds):
+        keywords = set(words[: random.randrange(len(words) + 1)])
+        keywords |= {
+            "".join(random.choices(alphabet, k=random.randrange(1, 4))).lower()
+            for _ in range(random.randrange(1, 30))
+        }
+        index = KeywordIndex({"site": keywords})
+        texts = [
+            "".join(random.choices(alphabet + "FUND", k=random.randrange(0, 60)))
+            + random.choice(["", " ", " Fund manager ", " S&P 500.", " C++"])
+            for _ in range(random.randrange(1, 8))
+        ]
+        expected = [match_keywords_regex(keywords, text) for text in texts]
+        got = [index.match_keywords("site", text) for text in texts]
+        if expected != got or index.match_keywords_many("site", texts) != expected:
+            failures += 1
+            print(f"keywords {sorted(keywords)!r} texts {texts!r}: regex {expected!r} != {got!r}")
+    print(f"{'keywords':<56} rounds: {rounds} {'FAILED' if failures else 'ok'}")
+    return failures
+
+
+def check_flows(pages):
+    with tempfile.TemporaryDirectory() as folder:
+        output_manager = OutputManager(
+            {"output_folder": folder, "staging_folder": folder}, "check_parsers"
+        )
+    saved, saved_json = {}, {}
+    for page in pages:
+        with open(page, "r", encoding="utf-8", errors="replace") as fp:
+            if page.endswith(".json"):
+                saved_json[page] = json.load(fp)
+            else:
+                saved[page] = fp.read()
+    failures = []
+    for function, site in flows_selectors().items():
+        url = site["url"] or f"https://{function}.example.com/"
+        # visit_page_and_get_data also reads the date off article pages of these sites
+        reconcilation_selector = output_manager.reconcilation_selector(url)
+        groups = {
+            "listing": site["listing"],
+            "article": site["article"] + ([reconcilation_selector] if reconcilation_selector else []),
+        }
+        if "/api/" in url:
+            # the listing is a json endpoint
+            name = f"{function} json"
+            payload = generate_payload()
+            selectors = groups.pop("listing") + json_selectors(payload)
+            group_failures, matched = check_json(name, url, payload, selectors)
+            for page, data in saved_json.items():
+                page_selectors = site["listing"] + json_selectors(data)
+                group_failures += check_json(f"{name} {page}", url, data, page_selectors)[0]
+            failures += group_failures
+            print(
+                f"{name:<56} selectors: {len(selectors)} parse: {'json':<8}"
+                f" answered: {matched:>2} {'FAILED' if group_failures else 'ok'}"
+            )
+        for kind, selectors in groups.items():
+            if not selectors:
+                continue
+            name = f"{function} {kind}"
+            group_failures, matched = check_page(name, url, generate_page(selectors), selectors)
+            for page, html in saved.items():
+                group_failures += check_page(f"{name} {page}", url, html, selectors)[0]
+            failures += group_failures
+            # a selector list the strainer can not express is parsed in full
+            parse = "strained" if selector_strainer(tuple(selectors)) else "full"
+            print(
+                f"{name:<56} selectors: {len(selectors)} parse: {parse:<8}"
+                f" answered: {matched:>2} {'FAILED' if group_failures else 'ok'}"
+            )
+    return failures
+
+
+if __name__ == "__main__":
+    html_parser = UrlParser.html_parser
+    failures = check_flows(sys.argv[1:])
+    UrlParser.html_parser = html_parser
+    for failure in failures:
+        print(failure)
+    keyword_failures = check_keywords()
+    sys.exit(1 if failures or keyword_failures else 0)
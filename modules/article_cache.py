@@ -0,0 +1,249 @@
+import logging
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from .url_parser import canonical_url
+
+
+class ArticleCache:
+    fields = ("title", "body", "author", "published_at")
+
+    def __init__(self, path, max_age_days=365):
+        self.path = path
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS articles (
+                    url TEXT PRIMARY KEY,
+                    title TEXT,
+                    body TEXT,
+                    author TEXT,
+                    published_at TEXT,
+                    fetched_at REAL NOT NULL
+                )"""
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_articles_published_at ON articles (published_at)"
+            )
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_articles_fetched_at ON articles (fetched_at)"
+            )
+            # articles each site listed, and the date range each site was fully
+            # crawled for, used by incremental sessions
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS site_articles (
+                    site TEXT NOT NULL,
+                    url_key TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    PRIMARY KEY (site, url_key)
+                )"""
+            )
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS watermarks (
+                    site TEXT PRIMARY KEY,
+                    covered_from TEXT NOT NULL,
+                    covered_to TEXT NOT NULL,
+                    latest_published_at TEXT,
+                    latest_url TEXT,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+        self.evict()
+
+    def get_many(self, urls) -> dict:
+        # returns {canonical url: {field: value}} for the urls already extracted
+        keys = list({canonical_url(url) for url in urls if url})
+        articles = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                rows = self.connection.execute(
+                    f"SELECT url, {', '.join(self.fields)} FROM articles WHERE url IN ({', '.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for url, *values in rows:
+                    articles[url] = dict(zip(self.fields, values))
+        return articles
+
+    def get(self, url):
+        return self.get_many([url]).get(canonical_url(url))
+
+    def put_many(self, articles):
+        # articles: iterable of (url, title, body, author, published_at), None keeps the stored value
+        now = time.time()
+        rows = [
+            (
+                canonical_url(url),
+                title,
+                body,
+                author,
+                published_at.isoformat()
+                if isinstance(published_at, datetime)
+                else published_at,
+                now,
+            )
+            for url, title, body, author, published_at in articles
+            if url
+        ]
+        if not rows:
+            return
+        try:
+            with self._lock, self.connection:
+                self.connection.executemany(
+                    """INSERT INTO articles (url, title, body, author, published_at, fetched_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET
+                        title = COALESCE(excluded.title, title),
+                        body = COALESCE(excluded.body, body),
+                        author = COALESCE(excluded.author, author),
+                        published_at = COALESCE(excluded.published_at, published_at),
+                        fetched_at = excluded.fetched_at""",
+                    rows,
+                )
+        except Exception as e:
+            logging.error(f"Error while caching {len(rows)} articles: {e}")
+
+    def put_site_rows(self, site, rows):
+        # rows: iterable of (title, body, url, published_at datetime or None, author)
+        # as listed by site, empty values keep the stored article's
+        rows = [row for row in rows if row[2]]
+        if not rows:
+            return
+        self.put_many(
+            (url, title or None, body or None, author or None, published_at)
+            for title, body, url, published_at, author in rows
+        )
+        try:
+            with self._lock, self.connection:
+                self.connection.executemany(
+                    """INSERT INTO site_articles (site, url_key, url) VALUES (?, ?, ?)
+                    ON CONFLICT(site, url_key) DO UPDATE SET url = excluded.url""",
+                    [(site, canonical_url(row[2]), row[2]) for row in rows],
+                )
+        except Exception as e:
+            logging.error(f"Error while storing {len(rows)} articles for {site}: {e}")
+
+    def rows_between(self, site, from_date: datetime, to_date: datetime) -> list:
+        # (title, body, url, published_at, author) listed by site and published on
+        # from_date..to_date, newest first, in just_save_data's row order. Articles
+        # whose date is unknown are returned too, with published_at None
+        with self._lock:
+            rows = self.connection.execute(
+                """SELECT articles.title, articles.body, site_articles.url,
+                    articles.published_at, articles.author
+                FROM site_articles JOIN articles ON articles.url = site_articles.url_key
+                WHERE site_articles.site = ? AND (
+                    articles.published_at IS NULL
+                    OR (articles.published_at >= ? AND articles.published_at < ?)
+                )
+                ORDER BY articles.published_at DESC""",
+                (
+                    site,
+                    from_date.date().isoformat(),
+                    (to_date.date() + timedelta(days=1)).isoformat(),
+                ),
+            ).fetchall()
+        return [
+            (
+                title or "",
+                body or "",
+                url,
+                datetime.fromisoformat(published_at) if published_at else None,
+                author or "",
+            )
+            for title, body, url, published_at, author in rows
+        ]
+
+    def get_watermark(self, site):
+        # {"covered_from": date, "covered_to": date, "latest_published_at", "latest_url"} or None
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT covered_from, covered_to, latest_published_at, latest_url FROM watermarks WHERE site = ?",
+                (site,),
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "covered_from": date.fromisoformat(row[0]),
+            "covered_to": date.fromisoformat(row[1]),
+            "latest_published_at": row[2],
+            "latest_url": row[3],
+        }
+
+    def update_watermark(self, site, covered_from: date, covered_to: date):
+        # records that site was fully crawled for covered_from..covered_to, merged with
+        # the range already covered when the two touch. Today is never covered, its
+        # articles are still being published
+        covered_to = min(covered_to, date.today() - timedelta(days=1))
+        if covered_from > covered_to:
+            return
+        watermark = self.get_watermark(site)
+        if (
+            watermark
+            and covered_from <= watermark["covered_to"] + timedelta(days=1)
+            and covered_to >= watermark["covered_from"] - timedelta(days=1)
+        ):
+            covered_from = min(covered_from, watermark["covered_from"])
+            covered_to = max(covered_to, watermark["covered_to"])
+        with self._lock, self.connection:
+            # newest article inside the covered range, meeting it again means the rest is stored
+            latest = self.connection.execute(
+                """SELECT articles.published_at, site_articles.url
+                FROM site_articles JOIN articles ON articles.url = site_articles.url_key
+                WHERE site_articles.site = ? AND articles.published_at >= ? AND articles.published_at < ?
+                ORDER BY articles.published_at DESC LIMIT 1""",
+                (
+                    site,
+                    covered_from.isoformat(),
+                    (covered_to + timedelta(days=1)).isoformat(),
+                ),
+            ).fetchone() or (None, None)
+            self.connection.execute(
+                """INSERT INTO watermarks
+                (site, covered_from, covered_to, latest_published_at, latest_url, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(site) DO UPDATE SET
+                    covered_from = excluded.covered_from,
+                    covered_to = excluded.covered_to,
+                    latest_published_at = excluded.latest_published_at,
+                    latest_url = excluded.latest_url,
+                    updated_at = excluded.updated_at""",
+                (
+                    site,
+                    covered_from.isoformat(),
+                    covered_to.isoformat(),
+                    latest[0],
+                    latest[1],
+                    time.time(),
+                ),
+            )
+        logging.info(f"Watermark for {site}: covered {covered_from} to {covered_to}, latest {latest[1]}")
+
+    def evict(self, max_age_days=None):
+        max_age_days = max_age_days or self.max_age_days
+        oldest = time.time() - max_age_days * 24 * 60 * 60
+        with self._lock, self.connection:
+            deleted = self.connection.execute(
+                "DELETE FROM articles WHERE fetched_at < ?", (oldest,)
+            ).rowcount
+            if deleted:
+                # sites that lost stored articles are crawled in full again
+                self.connection.execute(
+                    """DELETE FROM watermarks WHERE site IN (
+                        SELECT DISTINCT site FROM site_articles
+                        WHERE url_key NOT IN (SELECT url FROM articles)
+                    )"""
+                )
+                self.connection.execute(
+                    "DELETE FROM site_articles WHERE url_key NOT IN (SELECT url FROM articles)"
+                )
+        if deleted:
+            logging.info(f"Evicted {deleted} articles older than {max_age_days} days")
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
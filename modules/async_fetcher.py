@@ -0,0 +1,170 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from concurrent.futures import TimeoutError
+from requests.structures import CaseInsensitiveDict
+from .rate_limiter import THROTTLE_STATUS_CODES, rate_limiter as shared_rate_limiter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class FetchedResponse:
+    __slots__ = ("url", "status_code", "headers", "content", "encoding")
+
+    def __init__(self, url, status_code, headers, content, encoding=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.content = content
+        self.encoding = encoding
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncFetcher:
+    def __init__(self, pool_size=100, max_per_host=10, rate_limiter=None):
+        assert aiohttp, "aiohttp is required for the asyncio fetch backend"
+        self.pool_size = pool_size
+        self.max_per_host = max_per_host
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        self.session = None
+        # a single event loop thread does all the network io for this fetcher
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    async def _get_session(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size, limit_per_host=self.max_per_host
+            )
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    async def _get(self, url, timeout, headers=None):
+        session = await self._get_session()
+        wait = self.rate_limiter.reserve(url)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        async with session.get(
+            url, timeout=aiohttp.ClientTimeout(total=timeout), headers=headers
+        ) as response:
+            content = await response.read()
+            fetched_response = FetchedResponse(
+                url,
+                response.status,
+                dict(response.headers),
+                content,
+                response.charset,
+            )
+        self.rate_limiter.feedback(url, fetched_response)
+        return fetched_response
+
+    async def _fetch(
+        self, url, headers, timeout, max_retries, expected_status_code, kill_thread
+    ):
+        retries = 0
+        extended_timeout = 0
+        while retries < max_retries:
+            if kill_thread:
+                return None
+            try:
+                response = await self._get(url, timeout + extended_timeout, headers)
+                if response.status_code == expected_status_code:
+                    return response
+                elif response.status_code in THROTTLE_STATUS_CODES:
+                    # the rate limiter holds the next attempt back until the host recovers
+                    logging.warning(f"Retrying {url} ({retries}/{max_retries})")
+                    retries += 1
+                    continue
+                return response
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Error while fetching {url}: {e!r}")
+            retries += 1
+            extended_timeout += 4
+        logging.error(f"Max retries reached for {url}. Giving up.")
+        return None
+
+    async def _fetch_all(
+        self, urls, headers, timeout, max_retries, expected_status_code, kill_thread
+    ):
+        return await asyncio.gather(
+            *(
+                self._fetch(
+                    url,
+                    url_headers,
+                    timeout,
+                    max_retries,
+                    expected_status_code,
+                    kill_thread,
+                )
+                for url, url_headers in zip(urls, headers)
+            )
+        )
+
+    def _wait(self, future, kill_thread=None):
+        while True:
+            try:
+                return future.result(timeout=0.5)
+            except TimeoutError:
+                if kill_thread:
+                    future.cancel()
+                    return None
+
+    def get(self, url, timeout=3, headers=None, **kwargs):
+        future = asyncio.run_coroutine_threadsafe(
+            self._get(url, timeout, headers), self.loop
+        )
+        return future.result()
+
+    def fetch_many(
+        self,
+        urls,
+        headers=None,
+        timeout=3,
+        max_retries=3,
+        expected_status_code=200,
+        kill_thread=None,
+    ):
+        if not urls:
+            return []
+        start_time = time.time()
+        future = asyncio.run_coroutine_threadsafe(
+            self._fetch_all(
+                urls,
+                headers or [None] * len(urls),
+                timeout,
+                max_retries,
+                expected_status_code,
+                kill_thread,
+            ),
+            self.loop,
+        )
+        responses = self._wait(future, kill_thread)
+        if responses is None:
+            logging.error("Killing pending fetches")
+            return [None] * len(urls)
+        logging.debug(
+            f"Fetched {len(urls)} urls in {time.time() - start_time:.2f}s using asyncio"
+        )
+        return responses
+
+    def close(self):
+        if self.session is not None:
+            asyncio.run_coroutine_threadsafe(self.session.close(), self.loop).result()
+            self.session = None
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+        self.loop.close()
@@ -1,27 +1,57 @@
 import json
 import logging
 import os
+import sys
 import time
 from uuid import uuid4
+import xml.etree.ElementTree as ET
 from functools import partial
 from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
 
-from modules.url_parser import UrlParser, XMLParser
+from modules.url_parser import UrlParser, XMLParser, canonical_url
 from modules.keywords_manager import KeywordsManager
 from modules.output_manager import OutputManager
 from modules.helpers import paginate_filter_and_save_data,just_save_data
 from modules.general import calculate_time_taken, validate_configs
+from modules.http_client import HttpClient
+from modules.rate_limiter import rate_limiter
+from modules.response_cache import ResponseCache
+from modules.article_cache import ArticleCache
 
 
 max_threads = max(1, os.cpu_count() // 2)
-thread_executor = ThreadPoolExecutor(max_workers=max_threads)
 
 CONFIGS_FILE_PATH = "configs.json"
 with open(CONFIGS_FILE_PATH, "r") as fp:
     configs = json.load(fp)
 validate_configs(configs)
-
+UrlParser.set_html_parser(configs.get("html_parser"))
+rate_limiter.configure(
+    configs.get("rate_limits", {}), burst=configs.get("rate_limit_burst")
+)
+
+
+http_cache_configs = configs.get("http_cache", {})
+response_cache = (
+    ResponseCache(
+        os.path.join(configs["staging_folder"], "http_cache"),
+        max_size_mb=http_cache_configs.get("max_size_mb", 512),
+        ttls=http_cache_configs.get("ttl"),
+    )
+    if http_cache_configs.get("enabled", True)
+    else None
+)
+
+article_cache_configs = configs.get("article_cache", {})
+article_cache = (
+    ArticleCache(
+        os.path.join(configs["staging_folder"], "article_cache.sqlite"),
+        max_age_days=article_cache_configs.get("max_age_days", 365),
+    )
+    if article_cache_configs.get("enabled", True)
+    else None
+)
 
 # client_url_mapping = configs["search_url_client_url_mapping"]
 keywords_manager = KeywordsManager(configs)
@@ -32,7 +62,7 @@ def search_ft_markets(output_manager, url, url_id, from_date, to_date, kill_thre
     market_url = "https://www.ft.com/markets?page=1"
     time.sleep(0.01)
     try:
-        market_url_parser = UrlParser(market_url)
+        market_url_parser = UrlParser(market_url, http_client=output_manager.http_client)
         self = market_url_parser
         parent_next_page_selector = None
         next_page_selector = None
@@ -53,7 +83,7 @@ def search_ft_markets(output_manager, url, url_id, from_date, to_date, kill_thre
 
     try:
         logging.debug("configuring selectors for feed extraction")
-        match_keywords = partial(keywords_manager.match_keywords, url)
+        match_keywords_many = partial(output_manager.keyword_index.match_keywords_many, url)
         site_url = url
         parent_selector = ".o-teaser--article"
         date_selector = ".o-teaser__timestamp-date"
@@ -76,7 +106,7 @@ def search_ft_markets(output_manager, url, url_id, from_date, to_date, kill_thre
             site_url,
             url_id,
             paginator,
-            match_keywords,
+            match_keywords_many,
             title_selector=(parent_selector, title_selector),
             link_selector=(parent_selector, link_selector),
             title_body_selector=(title_body_parent_selector, title_body_selector),
@@ -86,6 +116,7 @@ def search_ft_markets(output_manager, url, url_id, from_date, to_date, kill_thre
             to_date=to_date,
             visit_to_get=["author","body"],
             kill_thread=kill_thread,
+            article_cache=article_cache,
         )
 
     except Exception as e:
@@ -102,7 +133,7 @@ def search_cityam_markets(output_manager, url, url_id, from_date, to_date, kill_
     # logging.info(f"current keyword: {keyword}")
     try:
         market_url = "https://www.cityam.com/category/markets/"
-        market_url_parser = UrlParser(market_url)
+        market_url_parser = UrlParser(market_url, http_client=output_manager.http_client)
         # self = market_url_parser
         parent_next_page_selector = None
         next_page_selector = ".next.page-numbers"
@@ -123,7 +154,7 @@ def search_cityam_markets(output_manager, url, url_id, from_date, to_date, kill_
     try:
         logging.debug("configuring selectors for feed extraction")
 
-        match_keywords = partial(keywords_manager.match_keywords, url)
+        match_keywords_many = partial(output_manager.keyword_index.match_keywords_many, url)
         site_url = url
 
         self = market_url_parser
@@ -147,7 +178,7 @@ def search_cityam_markets(output_manager, url, url_id, from_date, to_date, kill_
             site_url,
             url_id,
             paginator,
-            match_keywords,
+            match_keywords_many,
             title_selector=(title_parent_selector, title_selector),
             link_selector=(link_parent_selector, link_selector),
             title_body_selector=(title_body_parent_selector, title_body_selector),
@@ -157,6 +188,8 @@ def search_cityam_markets(output_manager, url, url_id, from_date, to_date, kill_
             to_date=to_date,
             visit_to_get=["body", "author"],
             kill_thread=kill_thread,
+            article_cache=article_cache,
+            date_seek=True,
         )
         # set(
         #     map(
@@ -185,7 +218,7 @@ def search_reuters_fundnews(
     # logging.info(f"current keyword: {keyword}")
     try:
         market_url = """https://www.reuters.com/pf/api/v3/content/fetch/articles-by-section-alias-or-id-v1?query={"arc-site":"reuters","called_from_a_component":true,"fetch_type":"collection","offset":21,"section_id":"/markets/funds/","size":9,"website":"reuters"}&d=179&_website=reuters"""
-        market_url_parser = UrlParser(market_url)
+        market_url_parser = UrlParser(market_url, http_client=output_manager.http_client)
         self = market_url_parser
         parent_next_page_selector = None
         next_page_selector = None
@@ -209,7 +242,7 @@ def search_reuters_fundnews(
     try:
         logging.debug("configuring selectors for feed extraction")
 
-        match_keywords = partial(keywords_manager.match_keywords, site_url)
+        match_keywords_many = partial(output_manager.keyword_index.match_keywords_many, site_url)
 
         self = market_url_parser
         parent_selector = None
@@ -244,7 +277,7 @@ def search_reuters_fundnews(
             site_url,
             url_id,
             paginator,
-            match_keywords,
+            match_keywords_many,
             title_selector=(title_parent_selector, title_selector),
             link_selector=(link_parent_selector, link_selector),
             title_body_selector=(title_body_parent_selector, title_body_selector),
@@ -254,6 +287,8 @@ def search_reuters_fundnews(
             to_date=to_date,
             visit_to_get=["body"],
             kill_thread=kill_thread,
+            article_cache=article_cache,
+            date_seek=True,
         )
         # set(
         #     map(
@@ -280,7 +315,9 @@ def search_hargreaves_lansdown_funds(
     # First verify endpoint is working
     try:
         homepage = "https://www.hl.co.uk/news/tags/funds"
-        homepage_parser = UrlParser(homepage, max_retries=5, timeout=15)
+        homepage_parser = UrlParser(
+            homepage, max_retries=5, timeout=15, http_client=output_manager.http_client
+        )
         assert homepage_parser.soup, f"Failed to load homepage : {homepage}"
         text = "\n".join(
             [
@@ -297,7 +334,9 @@ def search_hargreaves_lansdown_funds(
         logging.error(f"Error while loading main page of: {e}")
     try:
         market_url = "https://www.hl.co.uk/news/tags/funds?SQ_DESIGN_NAME=blank&SQ_PAINT_LAYOUT_NAME=tagging_pagnation&result_15077628_result_page=1"
-        market_url_parser = UrlParser(market_url, max_retries=3, timeout=15)
+        market_url_parser = UrlParser(
+            market_url, max_retries=3, timeout=15, http_client=output_manager.http_client
+        )
         assert market_url_parser.soup, f"Failed to load url: {url}"
         logging.debug("market_url loaded successfully")
         self = market_url_parser
@@ -323,7 +362,7 @@ def search_hargreaves_lansdown_funds(
     try:
         logging.debug("configuring selectors for feed extraction")
 
-        match_keywords = partial(keywords_manager.match_keywords, url)
+        match_keywords_many = partial(output_manager.keyword_index.match_keywords_many, url)
         site_url = url
 
         # self = market_url_parser
@@ -359,7 +398,7 @@ def search_hargreaves_lansdown_funds(
             site_url,
             url_id,
             paginator,
-            match_keywords,
+            match_keywords_many,
             title_selector=(title_parent_selector, title_selector),
             link_selector=(link_parent_selector, link_selector),
             title_body_selector=(title_body_parent_selector, title_body_selector),
@@ -370,6 +409,7 @@ def search_hargreaves_lansdown_funds(
             visit_to_get=["body"],
             timeout=12,
             kill_thread=kill_thread,
+            article_cache=article_cache,
         )
         # set(
         #     map(
@@ -396,7 +436,9 @@ def search_investmentweek_funds(
 
     try:
         market_url = "https://www.investmentweek.co.uk/category/investment/funds"
-        market_url_parser = UrlParser(market_url, timeout=5)
+        market_url_parser = UrlParser(
+            market_url, timeout=5, http_client=output_manager.http_client
+        )
         assert market_url_parser.soup, f"Failed to load url: {url}"
         logging.debug("market_url loaded successfully")
         self = market_url_parser
@@ -422,7 +464,7 @@ def search_investmentweek_funds(
     try:
         logging.debug("configuring selectors for feed extraction")
 
-        match_keywords = partial(keywords_manager.match_keywords, url)
+        match_keywords_many = partial(output_manager.keyword_index.match_keywords_many, url)
         site_url = url
 
         # self = market_url_parser
@@ -458,7 +500,7 @@ def search_investmentweek_funds(
             site_url,
             url_id,
             paginator,
-            match_keywords,
+            match_keywords_many,
             title_selector=(title_parent_selector, title_selector),
             link_selector=(link_parent_selector, link_selector),
             title_body_selector=(title_body_parent_selector, title_body_selector),
@@ -469,6 +511,7 @@ def search_investmentweek_funds(
             visit_to_get=["body", "author"],
             timeout=5,
             kill_thread=kill_thread,
+            article_cache=article_cache,
         )
         # set(
         #     map(
@@ -494,7 +537,9 @@ def search_etfstream(output_manager, url, url_id, from_date, to_date, kill_threa
     try:
         market_url = "https://www.etfstream.com/news/page/1"
         logging.info(f"Processing url: {market_url}")
-        market_url_parser = UrlParser(market_url, timeout=5)
+        market_url_parser = UrlParser(
+            market_url, timeout=5, http_client=output_manager.http_client
+        )
         assert market_url_parser.soup, f"Failed to load url: {url}"
         logging.debug("market_url loaded successfully")
         self = market_url_parser
@@ -520,7 +565,7 @@ def search_etfstream(output_manager, url, url_id, from_date, to_date, kill_threa
     try:
         logging.debug("configuring selectors for feed extraction")
 
-        match_keywords = partial(keywords_manager.match_keywords, url)
+        match_keywords_many = partial(output_manager.keyword_index.match_keywords_many, url)
         site_url = url
 
         # self = market_url_parser
@@ -556,7 +601,7 @@ def search_etfstream(output_manager, url, url_id, from_date, to_date, kill_threa
             site_url,
             url_id,
             paginator,
-            match_keywords,
+            match_keywords_many,
             title_selector=(title_parent_selector, title_selector),
             link_selector=(link_parent_selector, link_selector),
             title_body_selector=(title_body_parent_selector, title_body_selector),
@@ -567,6 +612,7 @@ def search_etfstream(output_manager, url, url_id, from_date, to_date, kill_threa
             visit_to_get=["body"],
             timeout=5,
             kill_thread=kill_thread,
+            article_cache=article_cache,
         )
     # set(
     #     map(
@@ -593,7 +639,9 @@ def search_morningstar_fund_research(
 
     try:
         market_url = "https://www.morningstar.co.uk/uk/collection/2114/fund-research--insights.aspx?page=1"
-        market_url_parser = UrlParser(market_url, timeout=5)
+        market_url_parser = UrlParser(
+            market_url, timeout=5, http_client=output_manager.http_client
+        )
         assert market_url_parser.soup, f"Failed to load url: {url}"
         logging.debug("market_url loaded successfully")
         self = market_url_parser
@@ -619,7 +667,7 @@ def search_morningstar_fund_research(
     try:
         logging.debug("configuring selectors for feed extraction")
 
-        match_keywords = partial(keywords_manager.match_keywords, url)
+        match_keywords_many = partial(output_manager.keyword_index.match_keywords_many, url)
         site_url = url
 
         # self = market_url_parser
@@ -658,7 +706,7 @@ def search_morningstar_fund_research(
             site_url,
             url_id,
             paginator,
-            match_keywords,
+            match_keywords_many,
             title_selector=(title_parent_selector, title_selector),
             link_selector=(link_parent_selector, link_selector),
             title_body_selector=(title_body_parent_selector, title_body_selector),
@@ -668,6 +716,7 @@ def search_morningstar_fund_research(
             to_date=to_date,
             visit_to_get=["body"],
             kill_thread=kill_thread,
+            article_cache=article_cache,
             # timeout=5,
         )
         # set(
@@ -695,7 +744,9 @@ def search_morningstar_investment_trust_research(
 
     try:
         market_url = "https://www.morningstar.co.uk/uk/collection/2135/investment-trust-research--insights.aspx"
-        market_url_parser = UrlParser(market_url, timeout=5)
+        market_url_parser = UrlParser(
+            market_url, timeout=5, http_client=output_manager.http_client
+        )
         assert market_url_parser.soup, f"Failed to load url: {url}"
         logging.debug("market_url loaded successfully")
         self = market_url_parser
@@ -721,7 +772,7 @@ def search_morningstar_investment_trust_research(
     try:
         logging.debug("configuring selectors for feed extraction")
 
-        match_keywords = partial(keywords_manager.match_keywords, url)
+        match_keywords_many = partial(output_manager.keyword_index.match_keywords_many, url)
         site_url = url
 
         # self = market_url_parser
@@ -760,7 +811,7 @@ def search_morningstar_investment_trust_research(
             site_url,
             url_id,
             paginator,
-            match_keywords,
+            match_keywords_many,
             title_selector=(title_parent_selector, title_selector),
             link_selector=(link_parent_selector, link_selector),
             title_body_selector=(title_body_parent_selector, title_body_selector),
@@ -770,6 +821,7 @@ def search_morningstar_investment_trust_research(
             to_date=to_date,
             visit_to_get=["body"],
             kill_thread=kill_thread,
+            article_cache=article_cache,
             # timeout=5,
         )
         # set(
@@ -795,7 +847,9 @@ def bestinvest(output_manager, url, url_id, from_date, to_date, kill_thread):
 
     try:
         market_url = "https://www.bestinvest.co.uk/news/investing/1"
-        market_url_parser = UrlParser(market_url, timeout=5)
+        market_url_parser = UrlParser(
+            market_url, timeout=5, http_client=output_manager.http_client
+        )
         assert market_url_parser.soup, f"Failed to load url: {url}"
         logging.debug("market_url loaded successfully")
         self = market_url_parser
@@ -821,7 +875,7 @@ def bestinvest(output_manager, url, url_id, from_date, to_date, kill_thread):
     try:
         logging.debug("configuring selectors for feed extraction")
 
-        match_keywords = partial(keywords_manager.match_keywords, url)
+        match_keywords_many = partial(output_manager.keyword_index.match_keywords_many, url)
         site_url = url
 
         # self = market_url_parser
@@ -862,7 +916,7 @@ def bestinvest(output_manager, url, url_id, from_date, to_date, kill_thread):
             site_url,
             url_id,
             paginator,
-            match_keywords,
+            match_keywords_many,
             title_selector=(title_parent_selector, title_selector),
             link_selector=(link_parent_selector, link_selector),
             title_body_selector=(title_body_parent_selector, title_body_selector),
@@ -872,6 +926,7 @@ def bestinvest(output_manager, url, url_id, from_date, to_date, kill_thread):
             to_date=to_date,
             visit_to_get=["body", "author"],
             kill_thread=kill_thread,
+            article_cache=article_cache,
             # timeout=5,
         )
         # set(
@@ -891,62 +946,136 @@ def bestinvest(output_manager, url, url_id, from_date, to_date, kill_thread):
     return
 
 
+SITEMAP_NAMESPACE = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+def iter_sitemap_urls(parser: XMLParser):
+    for url in parser.iter_elements(f"{SITEMAP_NAMESPACE}url"):
+        article_link = url.findtext(f"{SITEMAP_NAMESPACE}loc")
+        lastmod = url.findtext(f"{SITEMAP_NAMESPACE}lastmod")
+        try:
+            lastmod = datetime.strptime(lastmod, "%Y-%m-%dT%H:%M:%SZ")
+        except Exception as e:
+            logging.error(f"Error converting lastmod to datetime: {lastmod} for thisismoney url")
+        yield article_link, lastmod
+
+
+def this_is_money_batch(output_manager, site_url, batch, kill_thread):
+    # batch: [(article_link, lastmod), ...] -> page_data rows for just_save_data
+    title_links = [article_link for article_link, _ in batch]
+    cached_articles = article_cache.get_many(title_links) if article_cache else {}
+    cached = {}
+    for article_link in title_links:
+        cached_article = cached_articles.get(canonical_url(article_link))
+        if cached_article and all(
+            cached_article[field] is not None for field in ("title", "body", "author")
+        ):
+            cached[article_link] = cached_article
+    urls_to_visit = [url for url in title_links if url not in cached]
+    parsed_articles = dict(
+        zip(
+            urls_to_visit,
+            UrlParser.load_many(
+                urls_to_visit,
+                http_client=output_manager.http_client,
+                kill_thread=kill_thread,
+                page_kind="article",
+                selectors=[
+                    (None, "h1"),
+                    (None, '[itemprop="articleBody"]'),
+                    (None, ".author"),
+                ],
+            ),
+        )
+    )
+    if kill_thread:
+        logging.error("Killing the thread")
+        sys.exit()
+    page_data = []
+    visited_articles = []
+    for article_link, lastmod in batch:
+        if article_link in cached:
+            cached_article = cached[article_link]
+            page_data.append(
+                (
+                    cached_article["title"],
+                    cached_article["body"],
+                    article_link,
+                    lastmod,
+                    cached_article["author"],
+                )
+            )
+            continue
+        parsed_article = parsed_articles[article_link]
+        try:
+            title = parsed_article.get_from_selector(selector="h1")
+            title = title[0] if len(title) == 1 else ";".join(title)
+            body = parsed_article.get_from_selector(selector='[itemprop="articleBody"]')
+            body = body[0] if len(body) == 1 else ";".join(body)
+            author = parsed_article.get_from_selector(selector=".author")
+            author = author[0] if len(author) == 1 else ",".join(author)
+        except Exception as e:
+            logging.error(f"Error while extracting thisismoney article {article_link}: {e}")
+            continue
+        page_data.append((title, body, article_link, lastmod, author))
+        if body:
+            visited_articles.append((article_link, title, body, author, lastmod))
+    if article_cache:
+        article_cache.put_many(visited_articles)
+    return page_data
+
+
 def this_is_money(output_manager, site_url, url_id, from_date, to_date, kill_thread):
     try:
         from_date = datetime.strptime(from_date, "%Y-%m-%d")
         to_date = datetime.strptime(to_date, "%Y-%m-%d")
+        title_body_decode = lambda matched_by_title, matched_by_body: (
+                "",
+                matched_by_title,
+                matched_by_body,
+            )
+        match_keywords_many = partial(output_manager.keyword_index.match_keywords_many, site_url)
+        batch_size = configs.get("sitemap_batch_size", 20)
         current_date = from_date
-        titles = []
-        bodies = []
-        title_links = []
-        title_dates = []
-        authors = []
+        batch = []
+        batch_no = 0
+
+        def save_batch(batch, batch_no):
+            page_data = this_is_money_batch(output_manager, site_url, batch, kill_thread)
+            logging.info(f"Saving thisismoney batch {batch_no} of {len(page_data)} articles")
+            just_save_data(page_data,site_url,output_manager, site_url, url_id, from_date, to_date, title_body_decode,site_url,match_keywords_many,batch_no)
+
         while current_date <= to_date:
             logging.info(f"Searching thisismoney for date: {current_date}")
             print(f"Searching thisismoney for date: {current_date}")
             xml_url = f'https://www.thisismoney.co.uk/sitemap-articles-day~{current_date.strftime("%Y-%m-%d")}.xml'
-            parser = XMLParser(xml_url)
-            for url in parser.root_element.findall('{http://www.sitemaps.org/schemas/sitemap/0.9}url'):
-                article_link = url.find('{http://www.sitemaps.org/schemas/sitemap/0.9}loc').text
-                print(f"searching for url: {article_link}")
-                lastmod = url.find('{http://www.sitemaps.org/schemas/sitemap/0.9}lastmod').text
-                try:
-                    lastmod = datetime.strptime(lastmod,"%Y-%m-%dT%H:%M:%SZ")
-                except Exception as e:
-                    logging.error(f"Error converting lastmod to datetime: {lastmod} for thisismoney url")
-                if not article_link:continue
-                parsed_article = UrlParser(article_link)
-                title_links.append(article_link)
-                # Title
-                title = parsed_article.get_from_selector(selector='h1')
-                if len(title)==1:
-                    titles.extend(title)
-                else:
-                    titles.append(";".join(title))
-                # Body
-                body = parsed_article.get_from_selector(selector='[itemprop="articleBody"]')
-                if len(body)==1:
-                    bodies.extend(body)
-                else:
-                    bodies.append(";".join(body))
-                # title_date
-                author = parsed_article.get_from_selector(selector='.author')
-                if len(author)==1:
-                    authors.extend(author)
-                else:
-                    authors.append(",".join(author))
-                title_dates.append(lastmod)
+            parser = XMLParser(xml_url, http_client=output_manager.http_client, parse=False)
+            try:
+                for article_link, lastmod in iter_sitemap_urls(parser):
+                    if kill_thread:
+                        logging.error("Killing the thread")
+                        sys.exit()
+                    if not article_link:continue
+                    # rows outside the date range are dropped by just_save_data anyway
+                    if not isinstance(lastmod, datetime) or not (
+                        from_date.date() <= lastmod.date() <= to_date.date()
+                    ):
+                        logging.debug(f"Skipping {article_link}, lastmod {lastmod} out of range")
+                        continue
+                    batch.append((article_link, lastmod))
+                    if len(batch) >= batch_size:
+                        batch_no += 1
+                        save_batch(batch, batch_no)
+                        batch = []
+            except ET.ParseError as e:
+                # a broken sitemap only loses its own day, the pending batch is kept
+                logging.error(f"Error while parsing thisismoney sitemap {xml_url}: {e}")
 
             current_date += timedelta(days=1)
-        page_data = zip(titles, bodies, title_links, title_dates, authors)
-        title_body_decode = lambda matched_by_title, matched_by_body: (
-                "",
-                matched_by_title,
-                matched_by_body,
-            )
-        match_keywords = partial(keywords_manager.match_keywords, site_url)
-        just_save_data(page_data,site_url,output_manager, site_url, url_id, from_date, to_date, title_body_decode,site_url,match_keywords,1)
-    
+        if batch:
+            batch_no += 1
+            save_batch(batch, batch_no)
+
     except Exception as e:
         logging.error(f"Error while scraping this_is_money: {e}")
 
@@ -956,7 +1085,9 @@ def moneytothemasses(output_manager, url, url_id, from_date, to_date, kill_threa
 
     try:
         market_url = "https://moneytothemasses.com/category/news/page/1"
-        market_url_parser = UrlParser(market_url, timeout=5)
+        market_url_parser = UrlParser(
+            market_url, timeout=5, http_client=output_manager.http_client
+        )
         assert market_url_parser.soup, f"Failed to load url: {url}"
         logging.debug("market_url loaded successfully")
         self = market_url_parser
@@ -982,7 +1113,7 @@ def moneytothemasses(output_manager, url, url_id, from_date, to_date, kill_threa
     try:
         logging.debug("configuring selectors for feed extraction")
 
-        match_keywords = partial(keywords_manager.match_keywords, url)
+        match_keywords_many = partial(output_manager.keyword_index.match_keywords_many, url)
         site_url = url
 
         # self = market_url_parser
@@ -1019,7 +1150,7 @@ def moneytothemasses(output_manager, url, url_id, from_date, to_date, kill_threa
             site_url,
             url_id,
             paginator,
-            match_keywords,
+            match_keywords_many,
             title_selector=(title_parent_selector, title_selector),
             link_selector=(link_parent_selector, link_selector),
             title_body_selector=(title_body_parent_selector, title_body_selector),
@@ -1029,6 +1160,7 @@ def moneytothemasses(output_manager, url, url_id, from_date, to_date, kill_threa
             to_date=to_date,
             visit_to_get=["body"],
             kill_thread=kill_thread,
+            article_cache=article_cache,
             # timeout=5,
         )
         # set(
@@ -1100,37 +1232,79 @@ def search_manager(
                 moneytothemasses(output_manager, url, url_id, from_date, to_date, kill_thread)
             case _:
                 logging.warning(f"Support for URL: {url} has not yet added")
+                output_manager.report_progress(
+                    "error", site=url, message="Site is not supported", errors=1
+                )
                 return
-        logging.debug(f"Saving data for {url} in {output_manager.staging_folder_path}")
+        logging.debug(f"Saved data for {url} in session {output_manager.session_id}")
+        output_manager.report_progress("site_done", site=url)
     except Exception as e:
         logging.error(f"error while processing url: {url}: \n{e}")
+        output_manager.report_progress("error", site=url, message=str(e), errors=1)
     # output_manager.append_file(url_id, data)
 
 
 @calculate_time_taken
-def main(search_params, kill_thread=[], shared=None):
+def main(
+    search_params,
+    kill_thread=[],
+    shared=None,
+    fetch_backend=None,
+    output_format=None,
+    incremental=None,
+    progress=None,
+):
     futures = []
     session_id = uuid4()
-    output_manager = OutputManager(configs, session_id)
-    keywords_manager.load_keywords()
+    # one pool per session, so concurrent jobs don't queue behind each other's sites
+    thread_executor = ThreadPoolExecutor(max_workers=max_threads)
+    http_client = HttpClient(
+        pool_size=configs.get("http_pool_size", 10),
+        backend=fetch_backend or configs.get("fetch_backend", "requests"),
+        max_per_host=configs.get("http_max_per_host", 4),
+        max_workers=configs.get("article_workers", 8),
+        response_cache=response_cache,
+    )
+    logging.info(f"Using {http_client.backend} fetch backend")
+    # the session matches against one keywords snapshot, even if the file is edited mid run
+    keyword_index = keywords_manager.reload_if_changed()
+    if incremental is None:
+        incremental = configs.get("incremental", False)
+    output_manager = OutputManager(
+        configs,
+        session_id,
+        http_client,
+        keyword_index,
+        output_format=output_format,
+        article_cache=article_cache,
+        incremental=incremental,
+        progress=progress,
+    )
     # print(1, search_params)
-    for url_id, params in enumerate(search_params):
-        print(params)
-        url, from_date, to_date = params
-        logging.debug(f"Url {url} submitted to search manager")
-        futures.append(
-            thread_executor.submit(
-                search_manager,
-                url,
-                url_id,
-                output_manager,
-                from_date,
-                to_date,
-                kill_thread,
+    try:
+        for url_id, params in enumerate(search_params):
+            print(params)
+            url, from_date, to_date = params
+            logging.debug(f"Url {url} submitted to search manager")
+            futures.append(
+                thread_executor.submit(
+                    search_manager,
+                    url,
+                    url_id,
+                    output_manager,
+                    from_date,
+                    to_date,
+                    kill_thread,
+                )
             )
-        )
-    wait(futures, timeout=10000)
-    if not kill_thread:
-        processed_session_fname = output_manager.save_session_file()
-        if shared:
-            shared["latest_file_path"] = processed_session_fname
+        wait(futures, timeout=10000)
+        if not kill_thread:
+            output_manager.report_progress("saving", rows=len(output_manager.session_store))
+            processed_session_fname = output_manager.save_session_file(
+                rematch=configs.get("rematch_keywords", False)
+            )
+            if shared:
+                shared["latest_file_path"] = processed_session_fname
+    finally:
+        thread_executor.shutdown(wait=False, cancel_futures=True)
+        http_client.close()
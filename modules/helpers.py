@@ -1,8 +1,9 @@
-from .url_parser import UrlParser
+from .url_parser import Paginator, PrefetchingPaginator, UrlParser, canonical_url
 
 # from .keywords_manager import KeywordsManager
 from .output_manager import OutputManager
 import time
+import functools
 import logging
 from datetime import datetime, timedelta
 import sys
@@ -53,44 +54,66 @@ def todays_time(
     )
 
 
+# Define the pattern to match punctuations
+punctuation_pattern = re.compile(r"[^\w\s]")
+
+
 def remove_punctuations(text):
-    # Define the pattern to match punctuations
-    punctuation_pattern = r"[^\w\s]"
     # Substitute punctuations with an empty string
-    text_without_punctuations = re.sub(punctuation_pattern, "", text)
+    text_without_punctuations = punctuation_pattern.sub("", text)
     return text_without_punctuations
 
 
+class DateParser:
+    # the formats of one site, trying the format that last succeeded first
+    def __init__(self, formats):
+        self.formats = formats if isinstance(formats, tuple) else (formats,)
+        self.last_format = self.formats[0]
+
+    def parse(self, str_date) -> datetime:
+        last_format = self.last_format
+        try:
+            return datetime.strptime(str_date, last_format)
+        except ValueError:
+            pass
+        for format in self.formats:
+            if format == last_format:
+                continue
+            try:
+                date = datetime.strptime(str_date, format)
+            except ValueError:
+                continue
+            self.last_format = format
+            return date
+        raise ValueError(f"{str_date} does not match any of {self.formats}")
+
+
+@functools.lru_cache(maxsize=None)
+def get_date_parser(site_url):
+    netloc = urlparse(site_url).netloc
+    if site_url not in date_string_format and netloc not in date_string_format:
+        return None
+    return DateParser(date_string_format.get(site_url, date_string_format.get(netloc)))
+
+
+@functools.lru_cache(maxsize=8192)
+def parse_date(site_url, str_date) -> datetime:
+    if "|" in str_date:
+        str_date = str_date.split("|")[0].strip()
+    if "•" in str_date:
+        str_date = str_date.split("•")[0].strip()
+    return get_date_parser(site_url).parse(str_date.strip())
+
+
 def get_datetime(site_url, str_date):
     try:
-        netloc = urlparse(site_url).netloc
         # logging.debug("transforming date to datetime")
-        if site_url not in date_string_format and netloc not in date_string_format:
+        if get_date_parser(site_url) is None:
             logging.error(f"string format unknown for {site_url} ")
             return
         elif not str_date:
             return
-        if "|" in str_date:
-            str_date = str_date.split("|")[0].strip()
-        if "•" in str_date:
-            str_date = str_date.split("•")[0].strip()
-        if isinstance(
-            date_string_format.get(site_url, date_string_format.get(netloc)), tuple
-        ):
-            for format in date_string_format.get(
-                site_url, date_string_format.get(netloc)
-            ):
-                try:
-                    date = datetime.strptime(str_date.strip(), format)
-                    break
-                except:
-                    pass
-        else:
-            date = datetime.strptime(
-                str_date.strip(),
-                date_string_format.get(site_url, date_string_format.get(netloc)),
-            )
-        return repair(site_url, date)
+        return repair(site_url, parse_date(site_url, str_date))
     except Exception as e:
         logging.error(f"Error in get_datetime, {e} for {site_url} value: {str_date}")
 
@@ -117,20 +140,89 @@ def transform_date_to_output_format(site_url, i_date):
                 logging.warning(
                     f"No date value after get it from get_datetime func! for date: {i_date}"
                 )
+                date = ""
         else:
+            # left empty for finalize_session_data to reconcile
             logging.warning("Date is empty")
+            date = ""
     except Exception as e:
         logging.error(f"Error {e}")
         raise e
     return date
 
 
+def get_title_dates(paginated_url_parser, site_url, date_selector):
+    if site_url == "https://www.ft.com/markets":
+        return paginated_url_parser.get_from_selector_relative_traceback_to_parent(
+            None,
+            ".o-teaser--article",
+            {"name": "li"},
+            ".stream-card__date time",
+            get="text",
+        )
+    elif "www.bestinvest.co.uk" in site_url:
+        return paginated_url_parser.get_from_selector(
+            *date_selector,
+            get=lambda x: x.split("|")[0].strip(),
+            # from_parent_by=from_title_container_by
+        )
+    return paginated_url_parser.get_from_selector(
+        *date_selector,
+        get="text",
+        # from_parent_by=from_title_container_by
+    )
+
+
+def seek_start_page(
+    output_manager, site_url, paginator, date_selector, to_date, timeout, kill_thread
+):
+    # Listings are newest first, so "last date on the page <= to_date" is false
+    # for a run of pages and then true. Exponential probing followed by a
+    # binary search finds the first page that overlaps to_date. Pages before
+    # the returned one are known to only hold newer articles.
+    def overlaps(page):
+        if kill_thread:
+            logging.error("Killing the thread")
+            sys.exit()
+        url = paginator.page_url(page)
+        paginated_url_parser = UrlParser(
+            url, timeout=timeout, max_retries=5, http_client=output_manager.http_client
+        )
+        assert paginated_url_parser.soup, f"Failed to load url: {url}"
+        title_date = get_title_dates(paginated_url_parser, site_url, date_selector)
+        if not title_date:
+            # past the last page of results
+            return True
+        last_date = get_datetime(site_url, title_date[-1])
+        assert last_date, f"No date on page {page}: {url}"
+        logging.debug(f"Date seek probed page {page}, last date: {last_date}")
+        return last_date.date() <= to_date.date()
+
+    newer, probe = 0, 1  # newer: last page known to hold only newer articles
+    try:
+        while probe <= paginator.max_page and not overlaps(probe):
+            newer, probe = probe, probe * 2
+        upper = min(probe, paginator.max_page + 1)
+        while upper - newer > 1:
+            middle = (newer + upper) // 2
+            if overlaps(middle):
+                upper = middle
+            else:
+                newer = middle
+    except SystemExit:
+        raise
+    except Exception as e:
+        logging.error(f"Date seek for {site_url} stopped, {e}")
+    logging.info(f"Date seek for {site_url} starts at page {newer + 1}")
+    return newer + 1
+
+
 def paginate_filter_and_save_data(
     output_manager: OutputManager,
     site_url,
     url_id,
     paginator,
-    match_keywords,
+    match_keywords_many,
     title_selector,
     link_selector,
     title_body_selector,
@@ -142,6 +234,9 @@ def paginate_filter_and_save_data(
     timeout=3,
     kill_thread=[],
     mirror_site_url=None,
+    article_cache=None,
+    date_seek=False,
+    prefetch_pages=2,
 ):
     logging.debug("converting from_date,to_date to date_time")
     # from_date = '2024-04-15'
@@ -156,149 +251,253 @@ def paginate_filter_and_save_data(
     # current_page, url = next(paginator)
     if not mirror_site_url:
         mirror_site_url = site_url
+    # incremental sessions only crawl what is newer than the range already stored
+    store = output_manager.article_cache if output_manager.incremental else None
+    watermark = store.get_watermark(site_url) if store else None
+    incremental = bool(
+        watermark
+        and watermark["covered_from"] <= from_date.date() <= watermark["covered_to"]
+    )
+    if incremental and to_date.date() <= watermark["covered_to"]:
+        logging.info(
+            f"{site_url} is stored for {from_date.date()} to {to_date.date()}, skipping the crawl"
+        )
+        save_stored_rows(
+            output_manager, store, site_url, url_id, from_date, to_date, mirror_site_url, match_keywords_many
+        )
+        return
+    stop_date = from_date
+    latest_url = None
+    if incremental:
+        covered_to = watermark["covered_to"]
+        stop_date = max(
+            from_date, datetime(covered_to.year, covered_to.month, covered_to.day)
+        )
+        if watermark["latest_url"]:
+            latest_url = canonical_url(watermark["latest_url"])
+        logging.info(
+            f"Incremental crawl of {site_url}, stored up to {covered_to}, latest {watermark['latest_url']}"
+        )
+    # the watermark only covers what was really crawled: down to stop_date when the
+    # crawl got there, otherwise the days after the oldest article it reached
+    reached_stop = False
+    oldest_date = None
+    if date_seek and isinstance(paginator, Paginator):
+        paginator.start_page = seek_start_page(
+            output_manager, site_url, paginator, date_selector, to_date, timeout, kill_thread
+        )
     end_pagination = None
-    for current_page, url in paginator:
-        if kill_thread:
-            logging.error("Killing the thread")
-            sys.exit()
-        try:
-            logging.info(f"Page: {current_page} , {url}")
-            time.sleep(0.01)
-            paginated_url_parser = UrlParser(url, timeout=timeout, max_retries=5)
-            assert paginated_url_parser.soup, f"Failed to load url: {url}"
-            # 3
-            if site_url == "https://www.ft.com/markets":
-                title_date = (
-                    paginated_url_parser.get_from_selector_relative_traceback_to_parent(
-                        None,
-                        ".o-teaser--article",
-                        {"name": "li"},
-                        ".stream-card__date time",
-                        get="text",
+    pages = PrefetchingPaginator(
+        paginator,
+        depth=prefetch_pages,
+        timeout=timeout,
+        max_retries=5,
+        http_client=output_manager.http_client,
+    )
+    failed_pages = 0
+    try:
+        for current_page, url, page_future in pages:
+            if kill_thread:
+                logging.error("Killing the thread")
+                sys.exit()
+            try:
+                logging.info(f"Page: {current_page} , {url}")
+                time.sleep(0.01)
+                paginated_url_parser = page_future.result()
+                assert paginated_url_parser.soup, f"Failed to load url: {url}"
+                # 3
+                title_date = get_title_dates(paginated_url_parser, site_url, date_selector)
+                # print(2, title_date[-1])
+                title_date_dt = get_datetime(site_url, title_date[-1])
+                # print(3)
+                # if title_date_dt < from_date:
+                #     continue
+                if title_date_dt and (oldest_date is None or title_date_dt < oldest_date):
+                    oldest_date = title_date_dt
+                if title_date_dt and title_date_dt < stop_date:
+                    logging.info(
+                        f"will stop the loop for {url} as max_title_date:{title_date_dt}< to_date:{stop_date} for page result"
                     )
-                )
-            elif "www.bestinvest.co.uk" in site_url:
-                title_date = paginated_url_parser.get_from_selector(
-                    *date_selector,
-                    get=lambda x: x.split("|")[0].strip(),
-                    # from_parent_by=from_title_container_by
-                )
-            else:
-                title_date = paginated_url_parser.get_from_selector(
-                    *date_selector,
-                    get="text",
-                    # from_parent_by=from_title_container_by
-                )
-            # print(2, title_date[-1])
-            title_date_dt = get_datetime(site_url, title_date[-1])
-            # print(3)
-            # if title_date_dt < from_date:
-            #     continue
-            if title_date_dt and title_date_dt < from_date:
-                logging.info(
-                    f"will stop the loop for {url} as max_title_date:{title_date_dt}< to_date:{from_date} for page result"
-                )
-                end_pagination = True
-            logging.debug(f"feed last date: {title_date_dt}")
-            # 0
-            title = paginated_url_parser.get_from_selector(
-                *title_selector,
-                get="text",
-                # from_parent_by=from_title_container_by,
-            )
-            # 1
-            if "body" not in visit_to_get:
-                partial_body = paginated_url_parser.get_from_selector(
-                    *title_body_selector,
+                    end_pagination = True
+                    reached_stop = True
+                logging.debug(f"feed last date: {title_date_dt}")
+                # 0
+                title = paginated_url_parser.get_from_selector(
+                    *title_selector,
                     get="text",
                     # from_parent_by=from_title_container_by,
                 )
-            # 2
-            title_links = paginated_url_parser.get_from_selector(
-                *link_selector,
-                get="href",
-                # from_parent_by=from_title_container_by,
-            )
-            # canonical_title_links = paginated_url_parser.get_from_selector(
-            #     *link_selector,
-            #     get="href",
-            #     # from_parent_by=from_title_container_by,
-            # )
-            # domain_url = 'https://www.reuters.com'
-            # title_links = list(map(lambda x: f"{domain_url}{x}",canonical_title_links))
-
-            # 4
-            if "author" not in visit_to_get:
-                author = paginated_url_parser.get_from_selector(
-                    *author_selector,
-                    get="text",
-                    #   from_parent_by=from_title_container_by
+                # 1
+                if "body" not in visit_to_get:
+                    partial_body = paginated_url_parser.get_from_selector(
+                        *title_body_selector,
+                        get="text",
+                        # from_parent_by=from_title_container_by,
+                    )
+                # 2
+                title_links = paginated_url_parser.get_from_selector(
+                    *link_selector,
+                    get="href",
+                    # from_parent_by=from_title_container_by,
                 )
+                if latest_url and latest_url in {canonical_url(link) for link in title_links}:
+                    logging.info(
+                        f"will stop the loop for {url} as it lists {latest_url}, the latest stored article"
+                    )
+                    end_pagination = True
+                    reached_stop = True
+                # canonical_title_links = paginated_url_parser.get_from_selector(
+                #     *link_selector,
+                #     get="href",
+                #     # from_parent_by=from_title_container_by,
+                # )
+                # domain_url = 'https://www.reuters.com'
+                # title_links = list(map(lambda x: f"{domain_url}{x}",canonical_title_links))
 
-            resp_body, resp_author = visit_page_and_get_data(
-                visit_to_get,
-                site_url,
-                title_links,
-                title_body_selector,
-                author_selector,
-                timeout,
-                kill_thread,
-            )
-            if "body" in visit_to_get:
-                partial_body = resp_body
-            if "author" in visit_to_get:
-                author = resp_author
+                # 4
+                if "author" not in visit_to_get:
+                    author = paginated_url_parser.get_from_selector(
+                        *author_selector,
+                        get="text",
+                        #   from_parent_by=from_title_container_by
+                    )
+
+                resp_body, resp_author = visit_page_and_get_data(
+                    visit_to_get,
+                    site_url,
+                    title_links,
+                    title_body_selector,
+                    author_selector,
+                    timeout,
+                    kill_thread,
+                    http_client=output_manager.http_client,
+                    article_cache=article_cache,
+                    titles=title,
+                    title_dates=title_date,
+                    seen_urls=output_manager.seen_urls,
+                    date_reconciler=output_manager,
+                )
+                if "body" in visit_to_get:
+                    partial_body = resp_body
+                if "author" in visit_to_get:
+                    author = resp_author
+                # dates missing from the listing come from the article pages just visited
+                title_date = list(title_date)
+                for ind, link in enumerate(title_links[: len(title_date)]):
+                    if not title_date[ind]:
+                        title_date[ind] = output_manager.reconciled_date(link) or title_date[ind]
 
-            # logging.debug(f"Partial body: {partial_body}, author: {author}")
+                # logging.debug(f"Partial body: {partial_body}, author: {author}")
 
-            logging.debug(
-                f"title: {len(title)}, body: {len(partial_body)}, date: {len(title_date)}, links: {len(title_links)}, author: {len(author)}"
-            )
-            if not (len(title) == len(title_links) == len(title_date)):
-                logging.warning(
-                    f"Mismatch detected in no of extracted title: {len(title)}, links: {len(title_links)} and dates: {len(title_date)}"
+                logging.debug(
+                    f"title: {len(title)}, body: {len(partial_body)}, date: {len(title_date)}, links: {len(title_links)}, author: {len(author)}"
                 )
-                no_of_records = min(len(title), len(title_links), len(title_date))
-            else:
-                no_of_records = len(title)
-            # if not author:
-            #     author = (None for i in range(no_of_records))
+                if not (len(title) == len(title_links) == len(title_date)):
+                    logging.warning(
+                        f"Mismatch detected in no of extracted title: {len(title)}, links: {len(title_links)} and dates: {len(title_date)}"
+                    )
+                    no_of_records = min(len(title), len(title_links), len(title_date))
+                else:
+                    no_of_records = len(title)
+                # if not author:
+                #     author = (None for i in range(no_of_records))
 
-            if paginated_url_parser.soup:
-                page_data = zip(title, partial_body, title_links, title_date, author)
-                # next(page_data)
-            else:
-                # on request timed out reached limit
-                continue
-            # function
-            title_body_decode = lambda matched_by_title, matched_by_body: (
-                "",
-                matched_by_title,
-                matched_by_body,
+                if paginated_url_parser.soup:
+                    page_data = zip(title, partial_body, title_links, title_date, author)
+                    # next(page_data)
+                else:
+                    # on request timed out reached limit
+                    continue
+                # function
+                title_body_decode = lambda matched_by_title, matched_by_body: (
+                    "",
+                    matched_by_title,
+                    matched_by_body,
+                )
+                # logging.debug(
+                #     f"Page_data {url}: {title, partial_body, title_links, title_date, author}"
+                # )
+                just_save_data(
+                    page_data,
+                    site_url,
+                    output_manager,
+                    url,
+                    url_id,
+                    from_date,
+                    to_date,
+                    title_body_decode,
+                    mirror_site_url,
+                    match_keywords_many,
+                    current_page,
+                )
+                output_manager.report_progress(
+                    "page", site=site_url, page=current_page, url=url, pages=1
+                )
+                if end_pagination:
+                    break
+            except Exception as e:
+                failed_pages += 1
+                logging.error(f"error scraping data: {e} for url {url}")
+                output_manager.report_progress(
+                    "error", site=site_url, page=current_page, url=url, message=str(e), errors=1
+                )
+    finally:
+        # drops the prefetched pages once pagination ends early or the thread is killed
+        pages.close()
+    if incremental:
+        save_stored_rows(
+            output_manager, store, site_url, url_id, from_date, to_date, mirror_site_url, match_keywords_many
+        )
+    # a range is only marked as crawled once every page of it was read
+    if store and not kill_thread and not failed_pages:
+        if reached_stop:
+            store.update_watermark(site_url, stop_date.date(), to_date.date())
+        elif oldest_date:
+            logging.info(
+                f"Pagination of {site_url} ended at {oldest_date.date()} before reaching {stop_date.date()}"
             )
-            # logging.debug(
-            #     f"Page_data {url}: {title, partial_body, title_links, title_date, author}"
-            # )
-            just_save_data(
-                page_data,
-                site_url,
-                output_manager,
-                url,
-                url_id,
-                from_date,
-                to_date,
-                title_body_decode,
-                mirror_site_url,
-                match_keywords,
-                current_page,
+            store.update_watermark(
+                site_url, oldest_date.date() + timedelta(days=1), to_date.date()
             )
-            if end_pagination:
-                break
-        except Exception as e:
-            logging.error(f"error scraping data: {e} for url {url}")
     return
 
 
+def save_stored_rows(
+    output_manager, store, site_url, url_id, from_date, to_date, mirror_site_url, match_keywords_many
+):
+    # answers from_date..to_date from the article cache, matched with today's keywords.
+    # Stored articles without a date are reconciled now, and kept undated if that fails
+    stored_rows = store.rows_between(site_url, from_date, to_date)
+    undated = [row[2] for row in stored_rows if row[3] is None]
+    if undated:
+        reconciled = {}
+        for url, date in zip(undated, output_manager.reconsile_dates(undated)):
+            if date:
+                reconciled[url] = datetime.strptime(date, output_manager.date_output_format)
+        store.put_many(
+            (url, None, None, None, published_at) for url, published_at in reconciled.items()
+        )
+        stored_rows = [
+            row if row[3] is not None else (*row[:3], reconciled.get(row[2]), row[4])
+            for row in stored_rows
+        ]
+    logging.info(f"Answering {len(stored_rows)} articles of {site_url} from the store")
+    just_save_data(
+        stored_rows,
+        site_url,
+        output_manager,
+        site_url,
+        url_id,
+        from_date,
+        to_date,
+        lambda matched_by_title, matched_by_body: ("", matched_by_title, matched_by_body),
+        mirror_site_url,
+        match_keywords_many,
+        "store",
+        record=False,
+    )
+
+
 def visit_page_and_get_data(
     visit_to_get,
     site_url,
@@ -307,38 +506,139 @@ def visit_page_and_get_data(
     author_selector,
     timeout,
     kill_thread,
+    http_client=None,
+    article_cache=None,
+    titles=None,
+    title_dates=None,
+    seen_urls=None,
+    date_reconciler=None,
 ):
     logging.info(f"Visiting pages for: {site_url}")
     body = []
     author = []
     netloc = urlparse(site_url).netloc
+    fields = [field for field in ("body", "author") if field in visit_to_get]
+    # sites whose listings can miss dates get them from the article page while it is loaded
+    date_selector = (
+        date_reconciler.reconcilation_selector(site_url) if date_reconciler else None
+    )
 
+    titles = dict(zip(title_links, titles or []))
+    title_dates = dict(zip(title_links, title_dates or []))
+    cached_articles = article_cache.get_many(title_links) if article_cache else {}
+    cached = {}
     for url in title_links:
-        if kill_thread:
-            logging.error("Killing the thread")
-            sys.exit()
-        url_parser = UrlParser(url, timeout=timeout)
+        article = cached_articles.get(canonical_url(url))
+        if not article or any(article[field] is None for field in fields):
+            continue
+        # undated listings are only answered by a cached article that has its date
+        if date_selector and not title_dates.get(url) and not article["published_at"]:
+            continue
+        cached[url] = article
+    if cached:
+        logging.info(f"Article cache hits: {len(cached)}/{len(title_links)}")
+
+    urls_to_visit = [url for url in title_links if url not in cached]
+    # duplicates within this page, across pages or across sites are visited once
+    if seen_urls is not None:
+        owned, seen = seen_urls.claim(urls_to_visit, fields)
+        urls_to_visit = list(owned)
+    else:
+        owned, seen = {}, {}
+        urls_to_visit = list(dict.fromkeys(urls_to_visit))
+    extracted = {}
+    visited_articles = []
+    try:
+        url_parsers = dict(
+            zip(
+                urls_to_visit,
+                UrlParser.load_many(
+                    urls_to_visit,
+                    http_client=http_client,
+                    kill_thread=kill_thread,
+                    timeout=timeout,
+                    page_kind="article",
+                    selectors=[
+                        selector
+                        for field, selector in (
+                            ("body", title_body_selector),
+                            ("author", author_selector),
+                        )
+                        if field in visit_to_get
+                    ]
+                    + ([date_selector] if date_selector else []),
+                ),
+            )
+        )
+        for url in urls_to_visit:
+            if kill_thread:
+                logging.error("Killing the thread")
+                sys.exit()
+            url_parser = url_parsers[url]
+            body_text = author_text = None
+            if "body" in visit_to_get:
+                text = url_parser.get_from_selector(*title_body_selector, get="text")
+                body_text = ("\n".join(text) if text else "").strip()
+                if not body_text:
+                    logging.warning(f"Body not located for url: {url}")
+            if "author" in visit_to_get:
+                if netloc == "www.bestinvest.co.uk":
+                    getter = lambda x: x.replace("Written by", "")
+                else:
+                    getter = "text"
+                article_author = url_parser.get_from_selector(*author_selector, get=getter)
+                author_text = (
+                    (", ".join(article_author) if article_author else "")
+                    .strip()
+                    .strip(",")
+                    .strip()
+                )
+                if not author_text:
+                    logging.warning(f"author not located for url: {url}")
+            published_at = (
+                get_datetime(site_url, title_dates[url]) if title_dates.get(url) else None
+            )
+            if date_selector and not title_dates.get(url):
+                try:
+                    date_reconciler.record_article_date(url, url_parser)
+                    published_at = date_reconciler.reconciled_date(url)
+                except Exception as e:
+                    logging.error(f"Error while reading article date for {url}: {e}")
+            extracted[url] = {"body": body_text, "author": author_text, "published_at": published_at}
+            # pages that came back without a body are retried next time instead of cached
+            if body_text != "":
+                visited_articles.append(
+                    (
+                        url,
+                        titles.get(url),
+                        body_text,
+                        author_text,
+                        published_at,
+                    )
+                )
+    finally:
+        # waiters on a url this page failed to visit get None
+        if seen_urls is not None:
+            seen_urls.resolve(owned, extracted)
+    if seen:
+        extracted.update(seen_urls.wait(seen, kill_thread))
+    if kill_thread:
+        logging.error("Killing the thread")
+        sys.exit()
+    for url in title_links:
+        article = cached.get(url) or extracted.get(url)
+        if article is None:
+            logging.warning(f"No article data for url: {url}")
+            article = {"body": "", "author": ""}
         if "body" in visit_to_get:
-            text = url_parser.get_from_selector(*title_body_selector, get="text")
-            body_text = ("\n".join(text) if text else "").strip()
-            body.append(body_text)
-            if not body_text:
-                logging.warning(f"Body not located for url: {url}")
+            body.append(article["body"])
         if "author" in visit_to_get:
-            if netloc == "www.bestinvest.co.uk":
-                getter = lambda x: x.replace("Written by", "")
-            else:
-                getter = "text"
-            article_author = url_parser.get_from_selector(*author_selector, get=getter)
-            author_text = (
-                (", ".join(article_author) if article_author else "")
-                .strip()
-                .strip(",")
-                .strip()
-            )
-            author.append(author_text)
-            if not author_text:
-                logging.warning(f"author not located for url: {url}")
+            author.append(article["author"])
+        # cached and already visited articles carry the date read off their page
+        if date_reconciler and not title_dates.get(url) and article.get("published_at"):
+            date_reconciler.record_published_at(url, article["published_at"])
+    if article_cache:
+        article_cache.put_many(visited_articles)
     logging.debug(f"Extracted body: {len(body)}, authors: {len(author)}")
     return body, author
 
@@ -363,8 +663,9 @@ def just_save_data(
     to_date,
     title_body_decode,
     mirror_site_url,
-    match_keywords,
+    match_keywords_many,
     current_page,
+    record=True,
 ):
     filtered_data = []
     # data = next(page_data)
@@ -376,43 +677,71 @@ def just_save_data(
         "author",
     ]
     # data = next(page_data)
+    rows = []
     for data in page_data:
+        try:
+            rows.append(
+                (
+                    data,
+                    remove_punctuations(data[0]),
+                    remove_punctuations(data[1]),
+                    # reconciled dates are already datetimes
+                    data[3]
+                    if isinstance(data[3], datetime)
+                    else get_datetime(site_url, str(data[3])),
+                )
+            )
+        except Exception as e:
+            logging.error(f'Error while iterating data points from list in just save data: {e} for data: {data}')
+    # incremental sessions keep every listed article, in range or not, for later sessions
+    if record and output_manager.incremental:
+        try:
+            output_manager.article_cache.put_site_rows(
+                site_url,
+                (
+                    (data[0], data[1], data[2], data_date, data[4])
+                    for data, _, _, data_date in rows
+                ),
+            )
+        except Exception as e:
+            logging.error(f"Error while storing articles for {site_url}: {e}")
+    # titles and bodies of the whole page are matched in one pass
+    try:
+        matched = match_keywords_many(
+            [title for _, title, _, _ in rows] + [body for _, _, body, _ in rows]
+        )
+    except Exception as e:
+        logging.error(f"Error while matching keywords in just save data: {e}")
+        rows, matched = [], []
+    for (data, _, _, data_date), matched_by_title, matched_by_body in zip(
+        rows, matched[: len(rows)], matched[len(rows) :]
+    ):
         try:
             for ind, item in enumerate(data):
                 if page_data_headers[ind] in ("partial_body",):
                     continue
                 logging.debug(f"{page_data_headers[ind]} {item}")
             # if not str(data[3]):continue
-            data_date = get_datetime(site_url, str(data[3]))
             # logging.debug(f"data_date: {data_date}")
-            logging.debug(
-                f"{page_data_headers[0]} matched {match_keywords(remove_punctuations(data[0]))}"
-            )
-            logging.debug(
-                f"{page_data_headers[1]} matched {match_keywords(remove_punctuations(data[1]))}"
-            )
-            if match_keywords(remove_punctuations(data[0])) or match_keywords(
-                remove_punctuations(data[1])
-            ):
+            logging.debug(f"{page_data_headers[0]} matched {matched_by_title}")
+            logging.debug(f"{page_data_headers[1]} matched {matched_by_body}")
+            if matched_by_title or matched_by_body:
                 logging.debug(
-                    f"data_date: {data_date.date()} form_date: {from_date.date()} to_date: {to_date.date()}, consitions {from_date.date() == data_date.date()} or {to_date.date() == data_date.date()} or {from_date.date() <= data_date.date() <= to_date.date()} or {not data_date}"
+                    f"data_date: {data_date} form_date: {from_date.date()} to_date: {to_date.date()}"
                 )
-                if (
-                    (from_date.date() == data_date.date())
-                    or (to_date.date() == data_date.date())
-                    or (from_date.date() < data_date.date() < to_date.date())
-                    or (not data_date)
+                # rows without a date are kept, finalisation reconciles them
+                if data_date is None or (
+                    from_date.date() <= data_date.date() <= to_date.date()
                 ):
                     filtered_data.append(
                         (
                             url,
-                            transform_date_to_output_format(site_url, data[3]),  # Date
+                            transform_date_to_output_format(site_url, data_date),  # Date
                             data[0],  # Title
                             data[4],  # Author
                             data[2],  # URL
                             *title_body_decode(
-                                match_keywords(remove_punctuations(data[0])),
-                                match_keywords(remove_punctuations(data[1])),
+                                matched_by_title, matched_by_body
                             ),  # Title-Body keywords
                             mirror_site_url,  # Site
                         )
@@ -427,3 +756,10 @@ def just_save_data(
         )
         logging.debug(f"Filtered data: {url}, {filtered_data} ")
     output_manager.append_file(str(url_id), filtered_data)
+    output_manager.report_progress(
+        "rows",
+        site=site_url,
+        page=current_page,
+        articles=len(rows),
+        rows=len(filtered_data),
+    )
@@ -0,0 +1,158 @@
+import logging
+import threading
+import requests
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+from .async_fetcher import AsyncFetcher, aiohttp
+from .rate_limiter import rate_limiter as shared_rate_limiter
+
+
+class HttpClient:
+    def __init__(
+        self,
+        pool_size=10,
+        backend="requests",
+        max_per_host=10,
+        max_workers=8,
+        rate_limiter=None,
+        response_cache=None,
+    ):
+        self.pool_size = pool_size
+        self.response_cache = response_cache
+        self.max_per_host = max_per_host
+        self.rate_limiter = rate_limiter or shared_rate_limiter
+        self.sessions = {}
+        self.host_slots = {}
+        self._lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.async_fetcher = None
+        if backend == "asyncio":
+            if aiohttp:
+                self.async_fetcher = AsyncFetcher(
+                    pool_size=pool_size * max_per_host,
+                    max_per_host=max_per_host,
+                    rate_limiter=self.rate_limiter,
+                )
+            else:
+                logging.warning(
+                    "aiohttp is not installed, falling back to requests fetch backend"
+                )
+        self.backend = "asyncio" if self.async_fetcher else "requests"
+
+    def get_session(self, url) -> requests.Session:
+        # one keep-alive session per host, so every page of a site reuses its connections
+        netloc = urlparse(url).netloc
+        with self._lock:
+            session = self.sessions.get(netloc)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self.sessions[netloc] = session
+                logging.debug(f"Opened http session for {netloc}")
+        return session
+
+    def get_host_slot(self, url) -> threading.BoundedSemaphore:
+        netloc = urlparse(url).netloc
+        with self._lock:
+            if netloc not in self.host_slots:
+                self.host_slots[netloc] = threading.BoundedSemaphore(self.max_per_host)
+            return self.host_slots[netloc]
+
+    def _get(self, url, **kwargs):
+        if self.async_fetcher:
+            return self.async_fetcher.get(url, **kwargs)
+        self.rate_limiter.acquire(url)
+        with self.get_host_slot(url):
+            response = self.get_session(url).get(url, **kwargs)
+        self.rate_limiter.feedback(url, response)
+        return response
+
+    def _lookup_cache(self, url, page_kind):
+        # returns (cached response, conditional headers), cached response is None on a miss
+        if not self.response_cache:
+            return None, None
+        cached, fresh = self.response_cache.lookup(url, page_kind)
+        if cached is None:
+            return None, None
+        if fresh:
+            logging.debug(f"Response cache hit for {url}")
+            return cached, None
+        return cached, self.response_cache.conditional_headers(cached)
+
+    def _update_cache(self, url, cached, response):
+        if not self.response_cache or response is None:
+            return response
+        if cached is not None and response.status_code == 304:
+            logging.debug(f"Response cache revalidated {url}")
+            self.response_cache.refresh(url)
+            return cached
+        if response.status_code == 200:
+            self.response_cache.store(url, response)
+        return response
+
+    def get(self, url, page_kind="listing", **kwargs):
+        cached, conditional_headers = self._lookup_cache(url, page_kind)
+        if cached is not None and conditional_headers is None:
+            return cached
+        if conditional_headers:
+            kwargs["headers"] = {**kwargs.get("headers", {}), **conditional_headers}
+        return self._update_cache(url, cached, self._get(url, **kwargs))
+
+    @contextmanager
+    def stream(self, url, timeout=30, **kwargs):
+        # uncached response whose body is read with iter_content, for documents too
+        # large to hold in memory. Always goes through requests, also on the asyncio
+        # backend. The host slot is held until the body is read, so callers should
+        # read it to the end without fetching from the same host meanwhile
+        self.rate_limiter.acquire(url)
+        with self.get_host_slot(url):
+            with self.get_session(url).get(
+                url, stream=True, timeout=timeout, **kwargs
+            ) as response:
+                self.rate_limiter.feedback(url, response)
+                yield response
+
+    def map(self, func, items) -> list:
+        # results keep the order of items
+        return list(self.executor.map(func, items))
+
+    def fetch_many(self, urls, page_kind="listing", **kwargs):
+        assert self.async_fetcher, "fetch_many is only supported by the asyncio backend"
+        lookups = [self._lookup_cache(url, page_kind) for url in urls]
+        # fresh cache hits are answered right away, the rest go out (conditionally)
+        responses = [
+            cached if conditional_headers is None else None
+            for cached, conditional_headers in lookups
+        ]
+        pending = [ind for ind, response in enumerate(responses) if response is None]
+        fetched = self.async_fetcher.fetch_many(
+            [urls[ind] for ind in pending],
+            headers=[lookups[ind][1] for ind in pending],
+            **kwargs,
+        )
+        for ind, response in zip(pending, fetched):
+            responses[ind] = self._update_cache(urls[ind], lookups[ind][0], response)
+        return responses
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            for netloc, session in self.sessions.items():
+                try:
+                    session.close()
+                except Exception as e:
+                    logging.error(f"Error while closing http session for {netloc}: {e}")
+            self.sessions.clear()
+        if self.async_fetcher:
+            try:
+                self.async_fetcher.close()
+            except Exception as e:
+                logging.error(f"Error while closing async fetcher: {e}")
+            self.async_fetcher = None
+
+
+default_http_client = HttpClient()
@@ -0,0 +1,196 @@
+import logging
+import queue
+import threading
+import time
+from uuid import uuid4
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+SITE_COUNTERS = ("pages", "articles", "rows", "errors")
+
+
+class JobProgress:
+    # append only log of a job's progress events, with running per site totals,
+    # that any number of listeners can follow from any position
+    def __init__(self):
+        self.events = []
+        self.sites = {}
+        self.closed = False
+        self._condition = threading.Condition()
+
+    def emit(self, event, site=None, **data):
+        with self._condition:
+            record = {"event": event, "time": time.time(), **data}
+            if site:
+                totals = self.sites.setdefault(site, dict.fromkeys(SITE_COUNTERS, 0))
+                for counter in SITE_COUNTERS:
+                    totals[counter] += data.get(counter, 0)
+                record.update(site=site, totals=dict(totals))
+            self.events.append(record)
+            self._condition.notify_all()
+
+    def totals(self) -> dict:
+        with self._condition:
+            return {site: dict(totals) for site, totals in self.sites.items()}
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def follow(self, start=0, timeout=15):
+        # yields (index, event) as they are emitted, None after timeout seconds
+        # without any, and returns once the job finished and every event was read
+        index = start
+        while True:
+            with self._condition:
+                if index >= len(self.events) and not self.closed:
+                    self._condition.wait(timeout)
+                events = self.events[index:]
+                closed = self.closed
+            if not events:
+                if closed:
+                    return
+                yield None
+            for event in events:
+                yield index, event
+                index += 1
+
+
+class Job:
+    def __init__(self, params, kwargs):
+        self.job_id = uuid4().hex
+        self.params = params
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.error = None
+        # main signals the finished report through shared, and stops once kill_thread is non empty
+        self.shared = {"latest_file_path": None}
+        self.kill_thread = []
+        self.progress = JobProgress()
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def file_path(self):
+        return self.shared["latest_file_path"]
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "sites": [params[0] for params in self.params],
+            "progress": self.progress.totals(),
+            "file_path": self.file_path,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    # runs extraction jobs from a bounded queue on a fixed number of worker threads,
+    # jobs stay listed with their status and report path until history_size newer ones finished
+    def __init__(self, target, max_concurrent_jobs=2, max_queued_jobs=10, history_size=100):
+        self.target = target
+        self.history_size = history_size
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queued_jobs)
+        self.workers = [
+            threading.Thread(target=self._work, name=f"job-worker-{ind}", daemon=True)
+            for ind in range(max_concurrent_jobs)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, params, **kwargs) -> Job:
+        # raises queue.Full when max_queued_jobs are already waiting
+        job = Job(params, kwargs)
+        job.progress.emit("status", status=QUEUED)
+        with self._lock:
+            self._queue.put_nowait(job)
+            self.jobs[job.job_id] = job
+            self._forget_finished()
+        logging.info(f"Job {job.job_id} queued with {len(params)} sites")
+        return job
+
+    def get(self, job_id) -> Job:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self) -> list:
+        with self._lock:
+            return list(self.jobs.values())
+
+    def latest_finished(self) -> Job:
+        # most recently finished job that produced a report
+        with self._lock:
+            done = [job for job in self.jobs.values() if job.status == DONE and job.file_path]
+        return max(done, key=lambda job: job.finished_at, default=None)
+
+    def cancel(self, job_id) -> Job:
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job.kill_thread.append(1)
+            if job.status == QUEUED:
+                job.status = CANCELLED
+                job.finished_at = time.time()
+                job.progress.emit("status", status=CANCELLED)
+                job.progress.close()
+        logging.info(f"Job {job_id} cancelled")
+        return job
+
+    def _forget_finished(self):
+        finished = sorted(
+            (job for job in self.jobs.values() if job.status in FINISHED),
+            key=lambda job: job.finished_at,
+        )
+        for job in finished[: max(len(finished) - self.history_size, 0)]:
+            del self.jobs[job.job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                with self._lock:
+                    if job.status == CANCELLED:
+                        continue
+                    job.status = RUNNING
+                    job.started_at = time.time()
+                job.progress.emit("status", status=RUNNING)
+                logging.info(f"Job {job.job_id} started")
+                self.target(
+                    job.params,
+                    job.kill_thread,
+                    job.shared,
+                    progress=job.progress,
+                    **job.kwargs,
+                )
+                status = CANCELLED if job.kill_thread else DONE
+            except (Exception, SystemExit) as e:
+                # site workers leave with sys.exit once the job is cancelled
+                if job.kill_thread:
+                    status = CANCELLED
+                else:
+                    logging.error(f"Job {job.job_id} failed: {e}")
+                    job.error = str(e)
+                    status = FAILED
+            finally:
+                self._queue.task_done()
+            with self._lock:
+                job.status = status
+                job.finished_at = time.time()
+            job.progress.emit(
+                "status", status=status, file_path=job.file_path, error=job.error
+            )
+            job.progress.close()
+            logging.info(f"Job {job.job_id} {status}")
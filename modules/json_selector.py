@@ -0,0 +1,123 @@
+import functools
+import re
+
+
+# Decoded JSON exposed with the small part of the BeautifulSoup Tag api that
+# UrlParser uses, so JSON endpoints answer the same selector tuples as pages.
+# Every dict and every list is a "ul" node, every dict key a node named after
+# the key, every scalar list item an "li" node:
+#   {"articles": [{"title": "a", "authors": [{"name": "b"}]}]}
+#   -> ul > articles > ul > ul > (title, authors > ul > ul > name)
+
+
+class JsonNode:
+    __slots__ = ("name", "value", "parent", "children")
+
+    def __init__(self, name, value, parent=None):
+        self.name = name
+        self.value = value
+        self.parent = parent
+        self.children = []
+        if isinstance(value, dict):
+            if name == "ul":
+                self.children = [
+                    JsonNode(str(key).lower(), item, self) for key, item in value.items()
+                ]
+            else:
+                self.children = [JsonNode("ul", value, self)]
+        elif isinstance(value, list):
+            if name == "ul":
+                for item in value:
+                    if isinstance(item, dict):
+                        self.children.append(JsonNode("ul", item, self))
+                    elif isinstance(item, list):
+                        self.children.append(JsonNode("ul", {"list_item": item}, self))
+                    else:
+                        self.children.append(JsonNode("li", item, self))
+            else:
+                self.children = [JsonNode("ul", value, self)]
+
+    def __repr__(self):
+        return f"<JsonNode {self.name}>"
+
+    def descendants(self):
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def get_text(self):
+        if not self.children:
+            return "" if isinstance(self.value, (dict, list)) else str(self.value)
+        return "".join(node.get_text() for node in self.children)
+
+    @property
+    def text(self):
+        return self.get_text()
+
+    def get(self, key, default=None):
+        # a url stored as a plain string value stands in for an href attribute
+        if key == "href" and not self.children and isinstance(self.value, str):
+            return self.value
+        return default
+
+    def select(self, selector):
+        compiled = compile_selector(selector)
+        return [node for node in self.descendants() if _matches(node, compiled)]
+
+    def select_one(self, selector):
+        compiled = compile_selector(selector)
+        for node in self.descendants():
+            if _matches(node, compiled):
+                return node
+        return None
+
+
+class JsonDocument(JsonNode):
+    def __init__(self, data):
+        super().__init__("[document]", None)
+        self.value = data
+        self.children = [JsonNode("ul", data, self)]
+
+
+SELECTOR_STEP = re.compile(r"\s*(>)?\s*([\w*-]+)")
+
+
+@functools.lru_cache(maxsize=256)
+def compile_selector(selector):
+    # "a > b c, d" -> ((("a", None), ("b", ">"), ("c", " ")), (("d", None),))
+    groups = []
+    for group in selector.split(","):
+        steps, position = [], 0
+        group = group.strip()
+        while position < len(group):
+            step = SELECTOR_STEP.match(group, position)
+            if not step or step.end() == position:
+                raise ValueError(f"Unsupported json selector: {selector}")
+            combinator = None if not steps else (step[1] or " ")
+            steps.append((step[2].lower(), combinator))
+            position = step.end()
+        if steps:
+            groups.append(tuple(steps))
+    return tuple(groups)
+
+
+def _matches(node, compiled):
+    return any(_matches_steps(node, steps, len(steps) - 1) for steps in compiled)
+
+
+def _matches_steps(node, steps, ind):
+    name, combinator = steps[ind]
+    if name != "*" and node.name != name:
+        return False
+    if ind == 0:
+        return True
+    parent = node.parent
+    if combinator == ">":
+        return parent is not None and _matches_steps(parent, steps, ind - 1)
+    while parent is not None:
+        if _matches_steps(parent, steps, ind - 1):
+            return True
+        parent = parent.parent
+    return False
@@ -0,0 +1,101 @@
+import re
+from bisect import bisect_right
+from collections import deque
+
+SEPARATOR = "\x00"
+
+
+def _is_word(ch):
+    # same class as \w on str patterns
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordMatcher:
+    # Aho-Corasick automaton over a keyword list, answers the same question as
+    # re.search(r"\b" + re.escape(keyword) + r"\b", text.lower()) for every
+    # keyword at once, in a single pass over the text.
+    def __init__(self, keywords):
+        self.keywords = [keyword.lower() for keyword in keywords]
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]  # state -> indexes of the keywords ending there
+        self.empty_keywords = []
+        for ind, keyword in enumerate(self.keywords):
+            if not keyword:
+                self.empty_keywords.append(ind)
+                continue
+            state = 0
+            for ch in keyword:
+                next_state = self.goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][ch] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append(ind)
+        self._build_fail_links()
+
+    def _build_fail_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(ch, 0)
+                self.output[next_state] = (
+                    self.output[next_state] + self.output[self.fail[next_state]]
+                )
+
+    def _scan(self, text):
+        # yields (keyword index, end position) for every match with \b on both sides
+        goto, fail, output, keywords = self.goto, self.fail, self.output, self.keywords
+        state = 0
+        for end, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for ind in output[state]:
+                keyword = keywords[ind]
+                start = end - len(keyword) + 1
+                before = text[start - 1] if start else ""
+                after = text[end + 1] if end + 1 < len(text) else ""
+                if (before != "" and _is_word(before)) != _is_word(keyword[0]) and (
+                    after != "" and _is_word(after)
+                ) != _is_word(keyword[-1]):
+                    yield ind, end
+
+    def _empty_matches(self, text):
+        return self.empty_keywords if re.search(r"\b\b", text) else []
+
+    def find(self, text) -> list:
+        # indexes into self.keywords, in keyword order
+        text = text.lower()
+        found = {ind for ind, _ in self._scan(text)}
+        found.update(self._empty_matches(text))
+        return sorted(found)
+
+    def match(self, text) -> list:
+        return [self.keywords[ind] for ind in self.find(text)]
+
+    def find_many(self, texts) -> list:
+        # one scan over all texts joined by a separator no keyword contains, a
+        # non word character, so \b at the seams behaves as at the text edges
+        texts = [text.lower() for text in texts]
+        if any(SEPARATOR in keyword for keyword in self.keywords):
+            return [self.find(text) for text in texts]
+        starts, position = [], 0
+        for text in texts:
+            starts.append(position)
+            position += len(text) + len(SEPARATOR)
+        found = [set(self._empty_matches(text)) for text in texts]
+        for ind, end in self._scan(SEPARATOR.join(texts)):
+            found[bisect_right(starts, end) - 1].add(ind)
+        return [sorted(row) for row in found]
+
+    def match_many(self, texts) -> list:
+        return [[self.keywords[ind] for ind in row] for row in self.find_many(texts)]
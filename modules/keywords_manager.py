@@ -2,47 +2,101 @@ import os
 import logging
 import json
 import re
+import threading
+from .keyword_matcher import KeywordMatcher
+
+
+class KeywordIndex:
+    # immutable snapshot of the keywords file, a run keeps matching against the
+    # snapshot it started with while newer ones are swapped in
+    def __init__(self, keywords: dict, keywords_path="", version=None):
+        self.keywords = keywords
+        self.keywords_path = keywords_path
+        self.version = version
+        # built once per load, in the iteration order of each keyword set
+        self.matchers = {
+            url: KeywordMatcher(url_keywords) for url, url_keywords in keywords.items()
+        }
+
+    def get_keywords(self, url: str) -> set:
+        if url in self.keywords:
+            return self.keywords[url]
+        logging.warning(f"URL: {url} not present in {self.keywords_path}")
+        return set()
+
+    def match_keywords(self, url: str, title: str) -> str:
+        assert url in self.keywords, f"keywords list not configured for {url}"
+        return ":".join(self.matchers[url].match(title))
+
+    def match_keywords_many(self, url: str, texts: list) -> list:
+        # same result as [match_keywords(url, text) for text in texts]
+        assert url in self.keywords, f"keywords list not configured for {url}"
+        return [":".join(matched) for matched in self.matchers[url].match_many(texts)]
+
 
 class KeywordsManager:
     def __init__(self, configs):
         self.keywords_path = configs["url_keywords_path"]
-        self.keywords = None
+        self.index = KeywordIndex({}, self.keywords_path)
+        self._lock = threading.Lock()
         self.load_keywords()
 
-    def load_keywords(self) -> None:
+    @property
+    def keywords(self) -> dict:
+        return self.index.keywords
+
+    def _file_version(self):
+        # (mtime, size), so edits within one mtime tick are still noticed
         try:
-            if os.path.exists(self.keywords_path):
-                # keywords_path = 'configs.json'
-                with open(self.keywords_path, "r") as fp:
-                    data = json.load(fp)
-                    assert isinstance(
-                        data, dict
-                    ), f"{self.keywords_path} file has been corrupted, data is not of type dict but: {type(data)}"
-                    self.keywords = {
-                        url: set(
-                            keyword.lower()
-                            for keyword, isChecked in payload.get(
-                                "keywords", {}
-                            ).items()
-                            if isChecked == True
-                        )
-                        for url, payload in data.items()
-                    }
-            else:
-                logging.error(f"Keywords file not found at path: {self.keywords_path}")
-        except Exception as e:
-            logging.error(f"Failed to load keywords at {self.keywords_path}: {e}")
+            stat = os.stat(self.keywords_path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def load_keywords(self) -> KeywordIndex:
+        with self._lock:
+            try:
+                version = self._file_version()
+                if version is not None:
+                    # keywords_path = 'configs.json'
+                    with open(self.keywords_path, "r") as fp:
+                        data = json.load(fp)
+                        assert isinstance(
+                            data, dict
+                        ), f"{self.keywords_path} file has been corrupted, data is not of type dict but: {type(data)}"
+                        keywords = {
+                            url: set(
+                                keyword.lower()
+                                for keyword, isChecked in payload.get(
+                                    "keywords", {}
+                                ).items()
+                                if isChecked == True
+                            )
+                            for url, payload in data.items()
+                        }
+                    # fully built before the swap, readers see either the old or the new index
+                    self.index = KeywordIndex(keywords, self.keywords_path, version)
+                    logging.info(f"Loaded keywords for {len(keywords)} urls from {self.keywords_path}")
+                else:
+                    logging.error(f"Keywords file not found at path: {self.keywords_path}")
+            except Exception as e:
+                logging.error(f"Failed to load keywords at {self.keywords_path}: {e}")
+            return self.index
+
+    def reload_if_changed(self) -> KeywordIndex:
+        # returns the current index, rebuilt first if the keywords file changed on disk
+        version = self._file_version()
+        if version is not None and version != self.index.version:
+            return self.load_keywords()
+        return self.index
 
     def get_keywords(self, url: str) -> set:
         try:
-            if url in self.keywords:
-                return self.keywords[url]
-            else:
-                logging.warning(f"URL: {url} not present in {self.keywords_path}")
+            return self.index.get_keywords(url)
         except Exception as e:
             logging.error(f"Failed to get keyword: {e}")
-
         return set()
+
     def match_exact_keyword(self,keyword, text):
         pattern = r'\b' + re.escape(keyword.lower()) + r'\b'
         match = re.search(pattern, text.lower())
@@ -50,14 +104,12 @@ class KeywordsManager:
             return True
         else:
             return False
-    
+
     def match_keywords(self, url: str, title: str):
-        if not self.keywords:
-            self.keywords = self.load_keywords()
-        assert url in self.keywords, f"keywords list not configured for {url}"
-        return ":".join(
-            [keyword for keyword in self.keywords[url] if self.match_exact_keyword(keyword, title)]
-        )
+        return self.index.match_keywords(url, title)
+
+    def match_keywords_many(self, url: str, texts: list) -> list:
+        return self.index.match_keywords_many(url, texts)
 
     def update_all_keywords(self, data: dict) -> None:
         try:
@@ -66,5 +118,6 @@ class KeywordsManager:
             ), f"unable to update keywords, data is not of type dict but: {type(data)}"
             with open(self.keywords_path, "w") as fp:
                 json.dump(data, fp, indent=3)
+            self.load_keywords()
         except Exception as e:
             logging.error(f"Failed to update all keywords at {self.keywords_path}: {e}")
@@ -1,15 +1,42 @@
 import csv
 import os
 import logging
+import numpy as np
 import pandas as pd
-import shutil
 from datetime import datetime
-from .url_parser import UrlParser, urlparse
+from .url_parser import UrlParser, canonical_url, urlparse
+from .seen_urls import SeenUrls
+from .session_store import SessionStore
+from .report_writer import resolve_report_format, write_report
 
 
 class OutputManager:
-    def __init__(self, configs, session_id):
+    def __init__(
+        self,
+        configs,
+        session_id,
+        http_client=None,
+        keyword_index=None,
+        output_format=None,
+        article_cache=None,
+        incremental=False,
+        progress=None,
+    ):
         self.output_mode = "csv"
+        # format of the final report: xlsx, csv.gz, parquet or jsonl
+        self.output_format = resolve_report_format(
+            output_format or configs.get("output_format", "xlsx")
+        )
+        self.report_chunk_size = configs.get("report_chunk_size", 50000)
+        self.http_client = http_client
+        self.keyword_index = keyword_index
+        # incremental sessions store the listed articles per site in the article
+        # cache, and only crawl past the site's watermark
+        self.article_cache = article_cache
+        self.incremental = bool(incremental and article_cache)
+        # job progress log that listeners stream from, None outside of the job manager
+        self.progress = progress
+        self.seen_urls = SeenUrls()
         self.output_folder = configs["output_folder"]
         self.headers = [
             [
@@ -25,20 +52,20 @@ class OutputManager:
         ]
         self.session_id = str(session_id)
         self.session_data = []
-        self.staging_folder_path = os.path.join(
-            configs.get("staging_folder", ""), f".{self.session_id}"
-        )
-        os.mkdir(self.staging_folder_path)
+        # rows of the whole session, in memory instead of per url staging files
+        self.session_store = SessionStore(self.headers[0])
         self.validate()
         self.reconsilation_date_selectors_dict = {
             "www.cityam.com": (".article-header", "time", "%A %d %B %Y %I:%M %p")
         }
         self.date_output_format = "%B %d, %Y"
+        # canonical url -> reconciled date, filled while crawling and at the end
+        self.reconciled_dates = {}
         self.keep_session_file = False
 
     def validate(self):
         assert os.path.exists(
-            self.output_folder and self.staging_folder_path
+            self.output_folder
         ), f"Output path does not exists {self.output_folder}"
 
     def load_file(self, filename: str):
@@ -71,9 +98,11 @@ class OutputManager:
     def append_file(self, filename: str, data, staging=True):
         try:
             if staging:
-                fpath = os.path.join(self.staging_folder_path, filename)
-            else:
-                fpath = filename
+                # rows start with the search url, which the session output drops
+                self.session_store.append(row[1:] for row in data)
+                logging.info(f"Data successfully appended to session store for {filename}.")
+                return True
+            fpath = filename
             if not fpath.endswith(".csv"):
                 fpath += ".csv"
             with open(fpath, "a+", newline="", encoding="utf-8") as csvfile:
@@ -85,68 +114,116 @@ class OutputManager:
             logging.error(f"Error while appending data to {filename}: {e}")
             raise e
 
-    def save_session_file(self):
-        raw_name = f"raw-{self.session_id}.csv"
-        processed_name = f"Extracted-Data-{self.session_id}.xlsx"
-        raw_session_fname = os.path.join(self.output_folder, raw_name)
-        processed_session_fname = os.path.join(self.output_folder, processed_name)
-        self.append_file(raw_session_fname, self.headers, staging=False)
-        for url_file_name in os.listdir(self.staging_folder_path):
-            staging_filename = os.path.join(self.staging_folder_path, url_file_name)
-            url_data = self.load_file(staging_filename)
-            self.append_file(raw_session_fname, url_data, staging=False)
-
-        shutil.rmtree(self.staging_folder_path)
-        if os.path.exists(self.staging_folder_path):
-            shutil.rmtree(self.staging_folder_path)
-        df = pd.read_csv(raw_session_fname)
-        df.drop_duplicates(inplace=True)
-        agg_functions = {
-            "Date": "first",
-            "Title": "first",
-            "Author": "first",
-            "Title Keywords": lambda x: ":".join(
-                (str(i) for i in set(x) if pd.notna(i))
-            ),  # Concatenate with ':'
-            "Body Keywords": lambda x: ":".join(
-                (str(i) for i in set(x) if pd.notna(i))
-            ),  # Concatenate with ', '
-            # "Title/Body": "first",  # Use the first value
-            "Site": "first",
-            # "temp": "first",
+    def report_progress(self, event, site=None, **data):
+        if self.progress is None:
+            return
+        try:
+            self.progress.emit(event, site=site, **data)
+        except Exception as e:
+            logging.error(f"Error while reporting {event} progress for {site}: {e}")
+
+    def rematch_keywords(self, df) -> pd.DataFrame:
+        # re-runs the session's keyword snapshot over the final rows, one batch per
+        # site, with article bodies from the article cache. Rows without a cached
+        # body keep their Body Keywords, rows left without any match are dropped
+        cached_articles = (
+            self.article_cache.get_many(df["URL"].dropna().tolist())
+            if self.article_cache
+            else {}
+        )
+        bodies = {
+            url: article["body"]
+            for url, article in cached_articles.items()
+            if article["body"]
         }
-        # df.groupby(["Date", "Title", "Author", "URL", "Site"],axis=1).agg(['min'])
+        titles = df["Title"].fillna("").astype(str).str.replace(
+            r"[^\w\s]", "", regex=True
+        )
+        known_bodies = df["URL"].fillna("").map(lambda url: bodies.get(canonical_url(url)))
+        cleaned_bodies = known_bodies.fillna("").astype(str).str.replace(
+            r"[^\w\s]", "", regex=True
+        )
+        for site, index in df.groupby("Site").groups.items():
+            try:
+                df.loc[index, "Title Keywords"] = self.keyword_index.match_keywords_many(
+                    site, titles[index].tolist()
+                )
+                with_body = index[known_bodies[index].notna().to_numpy()]
+                if len(with_body):
+                    df.loc[with_body, "Body Keywords"] = self.keyword_index.match_keywords_many(
+                        site, cleaned_bodies[with_body].tolist()
+                    )
+            except Exception as e:
+                logging.error(f"Error while re-matching keywords for {site}: {e}")
+        matched = df["Title Keywords"].fillna("").ne("") | df["Body Keywords"].fillna("").ne("")
+        logging.info(f"Re-matched keywords, {(~matched).sum()} rows no longer match")
+        return df[matched].reset_index(drop=True)
+
+    @staticmethod
+    def _join_unique(df, column):
+        # per URL, the distinct non empty values of column joined with ":"
+        values = df[["URL", column]].dropna()
+        values[column] = values[column].astype(str)
+        values = values.drop_duplicates()
+        # string sum runs in cython, unlike a python join per group
+        joined = (values[column] + ":").groupby(values["URL"], sort=False).sum()
+        return joined.str[:-1]
+
+    def finalize_session_data(self, df, rematch=False) -> pd.DataFrame:
+        # one row per URL, sorted newest first, with columns as in self.headers
         columns = df.columns
-        deduplicated = df.groupby(["URL"]).agg(agg_functions).reset_index()
+        df = df.drop_duplicates()
+        deduplicated = df.groupby("URL")[["Date", "Title", "Author", "Site"]].first()
+        for column in ("Title Keywords", "Body Keywords"):
+            deduplicated[column] = (
+                self._join_unique(df, column).reindex(deduplicated.index).fillna("")
+            )
+        deduplicated = deduplicated.reset_index()
+        if rematch and self.keyword_index is not None:
+            deduplicated = self.rematch_keywords(deduplicated)
 
-        # reconsile date
-        deduplicated["Date"] = (
-            deduplicated[["Date", "URL"]]
-            .fillna("")
-            .apply(lambda row: self.reconsile_date(*row), axis=1)
-        )
+        # reconsile date, only rows without a date need a lookup
+        missing_date = deduplicated["Date"].isna() | deduplicated["Date"].eq("")
+        if missing_date.any():
+            deduplicated.loc[missing_date, "Date"] = self.reconsile_dates(
+                deduplicated.loc[missing_date, "URL"].fillna("").tolist()
+            )
 
-        deduplicated["Title/Body"] = deduplicated.apply(
-            lambda x: "yes/yes"
-            if (pd.notnull(x["Title Keywords"]) and x["Title Keywords"])
-            and (pd.notnull(x["Body Keywords"] and x["Body Keywords"]))
-            else (
-                "yes/no"
-                if (pd.notnull(x["Title Keywords"]) and x["Title Keywords"])
-                else ("no/yes")
-            ),
-            axis=1,
+        has_title = deduplicated["Title Keywords"].fillna("").ne("")
+        has_body = deduplicated["Body Keywords"].fillna("").ne("")
+        deduplicated["Title/Body"] = np.select(
+            [has_title & has_body, has_title], ["yes/yes", "yes/no"], default="no/yes"
         )
 
-        deduplicated['Date'] = pd.to_datetime(deduplicated['Date'])
+        try:
+            deduplicated["Date"] = pd.to_datetime(
+                deduplicated["Date"], format=self.date_output_format
+            )
+        except ValueError:
+            deduplicated["Date"] = pd.to_datetime(deduplicated["Date"])
         deduplicated.sort_values(
             ["Date", "Site"], ascending=[False, True], inplace=True
         )
 
         deduplicated['Date'] = deduplicated['Date'].dt.strftime(self.date_output_format)
-        deduplicated[columns].to_excel(processed_session_fname, index=False)
-        if not self.keep_session_file:
-            os.remove(raw_session_fname)
+        return deduplicated[columns]
+
+    def save_session_file(self, rematch=False):
+        raw_name = f"raw-{self.session_id}.csv"
+        processed_name = f"Extracted-Data-{self.session_id}"
+        raw_session_fname = os.path.join(self.output_folder, raw_name)
+        processed_session_fname = os.path.join(self.output_folder, processed_name)
+        df = self.session_store.to_dataframe()
+        self.session_store.clear()
+        if self.keep_session_file:
+            df.to_csv(raw_session_fname, index=False)
+        deduplicated = self.finalize_session_data(df, rematch=rematch)
+        processed_session_fname = write_report(
+            deduplicated,
+            processed_session_fname,
+            self.output_format,
+            chunk_size=self.report_chunk_size,
+        )
         print(f"Processed file: {processed_session_fname}")
         return processed_session_fname
         # os.remove(self.staging_folder_path)
@@ -159,33 +236,84 @@ class OutputManager:
         #     logging.error(f"Error while saving session file {fname}:\nSaved into logs")
         #     logging.error(str(self.session_data))
 
-    def reconsile_date(self, date, url):
+    def reconcilation_selector(self, url):
+        # (parent_selector, selector) holding the article date, None if not supported
+        entry = self.reconsilation_date_selectors_dict.get(urlparse(url).netloc)
+        return entry[:2] if entry else None
+
+    def record_article_date(self, url, url_parser) -> str:
+        # reads the date off a loaded article page and remembers it for the session
+        parent_selector, selector, format = self.reconsilation_date_selectors_dict[
+            urlparse(url).netloc
+        ]
+        date = url_parser.get_from_selector(parent_selector, selector)
         if date:
-            return date
-        parsed_url = urlparse(url)
-        if parsed_url.netloc in self.reconsilation_date_selectors_dict:
-            url_parser = UrlParser(url)
-            assert url_parser.soup, "Failed to load url"
-            parent_selector, selector, format = self.reconsilation_date_selectors_dict[
-                parsed_url.netloc
-            ]
-            date = url_parser.get_from_selector(parent_selector, selector)
-            if date:
-                try:
-                    date_time_obj = datetime.strptime(date[0], format)
-                    date = date_time_obj.strftime(self.date_output_format)
-                except Exception as e:
-                    logging.error(
-                        f"Error {e} while converting date to output_format/datetime, {date} {format} {self.date_output_format}"
-                    )
-                    date = ""
-            else:
+            try:
+                date_time_obj = datetime.strptime(date[0], format)
+                date = date_time_obj.strftime(self.date_output_format)
+            except Exception as e:
+                logging.error(
+                    f"Error {e} while converting date to output_format/datetime, {date} {format} {self.date_output_format}"
+                )
                 date = ""
-                logging.warning(f"Date not located in date reconcilation for url {url}")
         else:
-            logging.warning(f"Url {url} not supported for date reconsilation.")
+            date = ""
+            logging.warning(f"Date not located in date reconcilation for url {url}")
+        self.reconciled_dates[canonical_url(url)] = date
         return date
 
+    def record_published_at(self, url, published_at):
+        # date of url known from the article cache or another visit, datetime or iso string
+        if isinstance(published_at, str):
+            published_at = datetime.fromisoformat(published_at)
+        self.reconciled_dates[canonical_url(url)] = published_at.strftime(
+            self.date_output_format
+        )
+
+    def reconciled_date(self, url) -> datetime:
+        # date recorded for url during the crawl, None if none was found yet
+        date = self.reconciled_dates.get(canonical_url(url))
+        if not date:
+            return None
+        try:
+            return datetime.strptime(date, self.date_output_format)
+        except ValueError:
+            return None
+
+    def reconsile_dates(self, urls) -> list:
+        # dates for urls without one, pages not already seen during the crawl are
+        # fetched concurrently, grouped by site since each has its own selector
+        to_fetch = {}
+        for url in dict.fromkeys(urls):
+            if canonical_url(url) in self.reconciled_dates:
+                continue
+            selector = self.reconcilation_selector(url)
+            if selector:
+                to_fetch.setdefault(selector, []).append(url)
+            else:
+                logging.warning(f"Url {url} not supported for date reconsilation.")
+        for selector, selector_urls in to_fetch.items():
+            logging.info(f"Reconciling dates of {len(selector_urls)} articles")
+            url_parsers = UrlParser.load_many(
+                selector_urls,
+                http_client=self.http_client,
+                page_kind="article",
+                selectors=[selector],
+            )
+            for url, url_parser in zip(selector_urls, url_parsers):
+                try:
+                    assert url_parser and url_parser.soup, "Failed to load url"
+                    self.record_article_date(url, url_parser)
+                except Exception as e:
+                    logging.error(f"Error while reconciling date for {url}: {e}")
+                    self.reconciled_dates[canonical_url(url)] = ""
+        return [self.reconciled_dates.get(canonical_url(url), "") for url in urls]
+
+    def reconsile_date(self, date, url):
+        if date:
+            return date
+        return self.reconsile_dates([url])[0]
+
 
 # self = OutputManager()
 # reconsile_date(self, "", url)
@@ -0,0 +1,111 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+THROTTLE_STATUS_CODES = (429, 502, 503)
+
+
+def parse_retry_after(value):
+    # Retry-After is either delay-seconds or an HTTP-date
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except Exception as e:
+        logging.error(f"Unable to parse Retry-After header: {value}: {e}")
+        return None
+
+
+class TokenBucket:
+    __slots__ = ("max_rate", "rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate, capacity):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+
+    def reserve(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # tokens may go negative, callers queue up behind each other
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        return max(wait, self.blocked_until - now)
+
+
+class RateLimiter:
+    def __init__(self, default_rate=2.0, burst=4, rates=None, min_rate=0.05):
+        self.default_rate = default_rate
+        self.burst = burst
+        self.rates = rates or {}
+        self.min_rate = min_rate
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def configure(self, rate_limits: dict, burst=None):
+        rate_limits = dict(rate_limits or {})
+        with self._lock:
+            self.default_rate = rate_limits.pop("default", self.default_rate)
+            self.burst = burst or self.burst
+            self.rates = rate_limits
+            self.buckets = {}
+
+    def _bucket(self, netloc) -> TokenBucket:
+        if netloc not in self.buckets:
+            rate = self.rates.get(netloc, self.default_rate)
+            self.buckets[netloc] = TokenBucket(rate, self.burst)
+        return self.buckets[netloc]
+
+    def reserve(self, url) -> float:
+        netloc = urlparse(url).netloc
+        with self._lock:
+            return self._bucket(netloc).reserve(time.monotonic())
+
+    def acquire(self, url):
+        wait = self.reserve(url)
+        if wait > 0:
+            logging.debug(f"Rate limiting {urlparse(url).netloc} for {wait:.2f}s")
+            time.sleep(wait)
+
+    def backoff(self, url, retry_after=None):
+        netloc = urlparse(url).netloc
+        delay = parse_retry_after(retry_after)
+        with self._lock:
+            bucket = self._bucket(netloc)
+            bucket.rate = max(self.min_rate, bucket.rate / 2)
+            bucket.tokens = min(bucket.tokens, 0)
+            if delay is None:
+                delay = 1 / bucket.rate
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + delay)
+        logging.warning(
+            f"Throttled by {netloc}, pausing host for {delay:.2f}s at {bucket.rate:.2f} req/s"
+        )
+
+    def success(self, url):
+        netloc = urlparse(url).netloc
+        with self._lock:
+            bucket = self._bucket(netloc)
+            if bucket.rate < bucket.max_rate:
+                bucket.rate = min(bucket.max_rate, bucket.rate + bucket.max_rate / 10)
+
+    def feedback(self, url, response):
+        if response.status_code in THROTTLE_STATUS_CODES:
+            self.backoff(url, response.headers.get("Retry-After"))
+        elif response.status_code < 400:
+            self.success(url)
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,106 @@
+import gzip
+import json
+import logging
+import pandas as pd
+from openpyxl import Workbook
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+REPORT_FORMATS = {
+    "xlsx": ".xlsx",
+    "csv.gz": ".csv.gz",
+    "parquet": ".parquet",
+    "jsonl": ".jsonl",
+}
+EXCEL_MAX_ROWS = 1048576
+
+
+def resolve_report_format(preferred=None):
+    if preferred not in REPORT_FORMATS:
+        if preferred:
+            logging.warning(f"Unknown output format {preferred}, writing xlsx")
+        return "xlsx"
+    if preferred == "parquet" and not pyarrow:
+        logging.warning("pyarrow is not installed, writing xlsx instead of parquet")
+        return "xlsx"
+    return preferred
+
+
+def _chunks(df, chunk_size):
+    # an empty report is still one (empty) chunk, so headers get written
+    for start in range(0, max(len(df), 1), chunk_size):
+        yield df.iloc[start : start + chunk_size]
+
+
+def _cell(value):
+    return None if pd.isna(value) else value
+
+
+def write_xlsx(df, fpath, chunk_size):
+    # write only workbook, rows are streamed to disk instead of kept as cells
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(list(df.columns))
+    if len(df) >= EXCEL_MAX_ROWS:
+        logging.warning(
+            f"{len(df)} rows exceed the excel sheet limit, only the first {EXCEL_MAX_ROWS - 1} are written"
+        )
+        df = df.iloc[: EXCEL_MAX_ROWS - 1]
+    for chunk in _chunks(df, chunk_size):
+        for row in chunk.itertuples(index=False, name=None):
+            sheet.append([_cell(value) for value in row])
+    workbook.save(fpath)
+
+
+def write_csv_gz(df, fpath, chunk_size):
+    with gzip.open(fpath, "wt", newline="", encoding="utf-8") as fp:
+        for ind, chunk in enumerate(_chunks(df, chunk_size)):
+            chunk.to_csv(fp, index=False, header=not ind)
+
+
+def write_parquet(df, fpath, chunk_size):
+    # every report column is text, one row group per chunk
+    schema = pyarrow.schema([(str(column), pyarrow.string()) for column in df.columns])
+    with pyarrow.parquet.ParquetWriter(fpath, schema) as writer:
+        for chunk in _chunks(df, chunk_size):
+            writer.write_table(
+                pyarrow.Table.from_pydict(
+                    {
+                        str(column): [
+                            None if pd.isna(value) else str(value)
+                            for value in chunk[column]
+                        ]
+                        for column in df.columns
+                    },
+                    schema=schema,
+                )
+            )
+
+
+def write_jsonl(df, fpath, chunk_size):
+    with open(fpath, "w", encoding="utf-8") as fp:
+        for chunk in _chunks(df, chunk_size):
+            for row in chunk.itertuples(index=False, name=None):
+                record = dict(zip(df.columns, (_cell(value) for value in row)))
+                fp.write(json.dumps(record, ensure_ascii=False))
+                fp.write("\n")
+
+
+writers = {
+    "xlsx": write_xlsx,
+    "csv.gz": write_csv_gz,
+    "parquet": write_parquet,
+    "jsonl": write_jsonl,
+}
+
+
+def write_report(df, fpath_without_extension, output_format="xlsx", chunk_size=50000):
+    # returns the path written, output_format falls back to xlsx when unavailable
+    output_format = resolve_report_format(output_format)
+    fpath = f"{fpath_without_extension}{REPORT_FORMATS[output_format]}"
+    writers[output_format](df, fpath, chunk_size)
+    return fpath
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+from .async_fetcher import FetchedResponse
+
+# temp and body files older than this without an index entry are left over from crashed writers
+ORPHAN_AGE = 60 * 60
+
+
+class ResponseCache:
+    def __init__(self, folder, max_size_mb=512, ttls=None):
+        self.folder = folder
+        self.max_size = max_size_mb * 1024 * 1024
+        # {"default": {"listing": secs, "article": secs}, "<netloc>": {...}}
+        self.ttls = ttls or {}
+        self.default_ttls = {"listing": 600, "article": 30 * 24 * 60 * 60}
+        self.entries = OrderedDict()  # key -> size, least recently used first
+        self.total_size = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.folder, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        entries = []
+        for fname in os.listdir(self.folder):
+            if not fname.endswith(".json"):
+                continue
+            key = fname[: -len(".json")]
+            meta_path, body_path = self._paths(key)
+            try:
+                size = os.path.getsize(meta_path) + os.path.getsize(body_path)
+                entries.append((os.path.getmtime(meta_path), key, size))
+            except OSError:
+                self._remove_files(key)
+        for _, key, size in sorted(entries):
+            self.entries[key] = size
+            self.total_size += size
+        logging.debug(
+            f"Response cache loaded {len(self.entries)} entries ({self.total_size} bytes) from {self.folder}"
+        )
+
+    def _key(self, url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def _paths(self, key):
+        return (
+            os.path.join(self.folder, f"{key}.json"),
+            os.path.join(self.folder, f"{key}.body"),
+        )
+
+    def _remove_files(self, key):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _write_atomic(self, path, data):
+        # every writer gets its own temp file, so concurrent stores of one url
+        # can't interleave, the last rename wins with a complete file
+        with tempfile.NamedTemporaryFile(
+            dir=self.folder, suffix=".tmp", delete=False
+        ) as fp:
+            fp.write(data)
+        try:
+            os.replace(fp.name, path)
+        except Exception:
+            os.remove(fp.name)
+            raise
+
+    def get_ttl(self, url, page_kind):
+        netloc = urlparse(url).netloc
+        ttl = self.ttls.get(netloc, {}).get(page_kind)
+        if ttl is None:
+            ttl = self.ttls.get("default", {}).get(
+                page_kind, self.default_ttls.get(page_kind, 0)
+            )
+        return ttl
+
+    def lookup(self, url, page_kind="listing"):
+        # returns (cached response or None, whether it is still within its ttl)
+        key = self._key(url)
+        with self._lock:
+            if key not in self.entries:
+                return None, False
+            self.entries.move_to_end(key)
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as fp:
+                meta = json.load(fp)
+            with open(body_path, "rb") as fp:
+                content = fp.read()
+            os.utime(meta_path)
+        except Exception as e:
+            logging.error(f"Error while reading cached response for {url}: {e}")
+            self.discard(url)
+            return None, False
+        response = FetchedResponse(
+            url, meta["status_code"], meta["headers"], content, meta["encoding"]
+        )
+        fresh = time.time() - meta["stored_at"] < self.get_ttl(url, page_kind)
+        return response, fresh
+
+    def conditional_headers(self, response):
+        headers = {}
+        if response.headers.get("ETag"):
+            headers["If-None-Match"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            headers["If-Modified-Since"] = response.headers["Last-Modified"]
+        return headers
+
+    def store(self, url, response):
+        key = self._key(url)
+        meta_path, body_path = self._paths(key)
+        meta = {
+            "url": url,
+            "status_code": response.status_code,
+            "headers": {
+                k: v
+                for k, v in response.headers.items()
+                if k.lower() in ("content-type", "etag", "last-modified")
+            },
+            "encoding": response.encoding,
+            "stored_at": time.time(),
+        }
+        try:
+            # write then rename, so readers never see a half written entry
+            self._write_atomic(body_path, response.content)
+            self._write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+            size = os.path.getsize(meta_path) + os.path.getsize(body_path)
+        except Exception as e:
+            logging.error(f"Error while caching response for {url}: {e}")
+            return
+        with self._lock:
+            self.total_size += size - self.entries.pop(key, 0)
+            self.entries[key] = size
+            self._evict()
+
+    def refresh(self, url):
+        # 304 Not Modified, restart the ttl of the cached entry
+        meta_path, _ = self._paths(self._key(url))
+        try:
+            with open(meta_path, "r", encoding="utf-8") as fp:
+                meta = json.load(fp)
+            meta["stored_at"] = time.time()
+            self._write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+        except Exception as e:
+            logging.error(f"Error while refreshing cached response for {url}: {e}")
+
+    def discard(self, url):
+        key = self._key(url)
+        with self._lock:
+            self.total_size -= self.entries.pop(key, 0)
+        self._remove_files(key)
+
+    def _evict(self):
+        evicted = False
+        while self.total_size > self.max_size and len(self.entries) > 1:
+            key, size = self.entries.popitem(last=False)
+            self.total_size -= size
+            self._remove_files(key)
+            evicted = True
+        if evicted:
+            self._remove_orphans()
+
+    def _remove_orphans(self):
+        # .tmp files and .body files without an index entry don't count towards the
+        # cache size, recent ones may still belong to a store in progress
+        expired = time.time() - ORPHAN_AGE
+        for fname in os.listdir(self.folder):
+            key, ext = os.path.splitext(fname)
+            if not (ext == ".tmp" or (ext == ".body" and key not in self.entries)):
+                continue
+            path = os.path.join(self.folder, fname)
+            try:
+                if os.path.getmtime(path) < expired:
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,49 @@
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError
+from .url_parser import canonical_url
+
+
+class SeenUrls:
+    # session wide record of the articles visited so far, keyed by canonical url
+    # and the fields extracted. The first caller to claim a url visits it, later
+    # callers (other pages, other sites) wait for and reuse its result.
+    def __init__(self):
+        self.articles = {}
+        self._lock = threading.Lock()
+
+    def claim(self, urls, fields) -> tuple:
+        # returns ({url: future} this caller must resolve, {url: future} to wait for)
+        owned, seen = {}, {}
+        fields = tuple(fields)
+        with self._lock:
+            for url in urls:
+                if url in owned or url in seen:
+                    continue
+                key = (canonical_url(url), fields)
+                future = self.articles.get(key)
+                if future is None:
+                    future = self.articles[key] = Future()
+                    owned[url] = future
+                else:
+                    seen[url] = future
+        if seen:
+            logging.info(f"Skipping {len(seen)} articles already visited in this session")
+        return owned, seen
+
+    def resolve(self, owned: dict, articles: dict):
+        # articles: {url: {field: value}}, urls missing from it resolve to None
+        for url, future in owned.items():
+            if not future.done():
+                future.set_result(articles.get(url))
+
+    def wait(self, seen: dict, kill_thread) -> dict:
+        articles = {}
+        for url, future in seen.items():
+            while not kill_thread:
+                try:
+                    articles[url] = future.result(timeout=0.5)
+                    break
+                except TimeoutError:
+                    continue
+        return articles
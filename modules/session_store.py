@@ -0,0 +1,31 @@
+import threading
+import pandas as pd
+
+
+class SessionStore:
+    # thread safe columnar buffer of a session's output rows, site workers append
+    # to it directly and save_session_file turns it into one DataFrame
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.data = {column: [] for column in self.columns}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.data[self.columns[0]])
+
+    def append(self, rows):
+        with self._lock:
+            for row in rows:
+                for column, value in zip(self.columns, row):
+                    self.data[column].append(value)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        with self._lock:
+            df = pd.DataFrame({column: list(values) for column, values in self.data.items()})
+        # empty values were read back as NaN from the staging csv files
+        return df.mask(df.eq(""))
+
+    def clear(self):
+        with self._lock:
+            for values in self.data.values():
+                values.clear()
@@ -1,12 +1,207 @@
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
+import functools
+import io
 import logging
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import time
 import re
 import requests
-from urllib.parse import urlparse, urljoin, parse_qs, urlencode, urlunparse
+from urllib.parse import (
+    urlparse,
+    urljoin,
+    parse_qs,
+    parse_qsl,
+    urlencode,
+    urlunparse,
+)
 import xml.etree.ElementTree as ET
+from .http_client import default_http_client
+from .rate_limiter import THROTTLE_STATUS_CODES
+from .json_selector import JsonDocument
+
+
+def canonical_url(url: str) -> str:
+    # same article behind different tracking params/fragments maps to one url
+    parsed_url = urlparse(url.strip())
+    query = urlencode(
+        sorted(
+            (key, value)
+            for key, value in parse_qsl(parsed_url.query, keep_blank_values=True)
+            if not key.lower().startswith("utm_")
+        )
+    )
+    return urlunparse(
+        (
+            parsed_url.scheme.lower(),
+            parsed_url.netloc.lower(),
+            parsed_url.path.rstrip("/") or "/",
+            parsed_url.params,
+            query,
+            "",
+        )
+    )
+
+
+# pseudo classes that only look at the element itself and its descendants
+SUBTREE_PSEUDO_CLASSES = (":-soup-contains-own", ":-soup-contains", ":contains", ":has")
+COMPOUND_SELECTOR_TOKEN = re.compile(
+    r"""(?P<tag>[a-zA-Z][\w-]*|\*)"""
+    r"""|\#(?P<id>[\w-]+)"""
+    r"""|\.(?P<cls>[\w-]+)"""
+    r"""|\[\s*(?P<attr>[\w-]+)\s*(?:(?P<op>[*^$|~]?=)\s*(?P<val>"[^"]*"|'[^']*'|[^\]\s]+))?\s*(?:[iIsS]\s*)?\]"""
+)
+
+
+def _split_selector_list(selector):
+    groups, depth, start = [], 0, 0
+    for ind, char in enumerate(selector):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "," and not depth:
+            groups.append(selector[start:ind])
+            start = ind + 1
+    groups.append(selector[start:])
+    return [group.strip() for group in groups if group.strip()]
+
+
+def _root_compound(selector):
+    # first compound of a complex selector, without its subtree pseudo classes.
+    # None when the match depends on something outside the element's subtree.
+    compound, depth, ind = "", 0, 0
+    while ind < len(selector):
+        char = selector[ind]
+        if not depth and (char.isspace() or char in ">~+"):
+            break
+        if not depth and char == ":":
+            pseudo = next(
+                (p for p in SUBTREE_PSEUDO_CLASSES if selector.startswith(p, ind)), None
+            )
+            if not pseudo or selector[ind + len(pseudo) : ind + len(pseudo) + 1] != "(":
+                return None
+            ind += len(pseudo)
+            depth = 0
+            while ind < len(selector):
+                depth += {"(": 1, ")": -1}.get(selector[ind], 0)
+                ind += 1
+                if not depth:
+                    break
+            continue
+        depth += {"[": 1, "]": -1}.get(char, 0)
+        compound += char
+        ind += 1
+    rest = selector[ind:].lstrip()
+    if rest[:1] in ("~", "+"):
+        return None
+    return compound
+
+
+def _compound_rule(compound):
+    rule = {"tag": None, "id": None, "classes": [], "attrs": []}
+    position = 0
+    for token in COMPOUND_SELECTOR_TOKEN.finditer(compound):
+        if token.start() != position or (token["tag"] and position):
+            return None
+        position = token.end()
+        if token["tag"]:
+            rule["tag"] = None if token["tag"] == "*" else token["tag"].lower()
+        elif token["id"]:
+            rule["id"] = token["id"]
+        elif token["cls"]:
+            rule["classes"].append(token["cls"])
+        else:
+            value = token["val"]
+            if value and value[0] in "'\"":
+                value = value[1:-1]
+            rule["attrs"].append((token["attr"].lower(), token["op"], value))
+    if position != len(compound) or not compound:
+        return None
+    return rule
+
+
+def _attribute_matches(value, op, expected):
+    if value is None:
+        return False
+    if isinstance(value, (list, tuple)):
+        value = " ".join(value)
+    match op:
+        case None:
+            return True
+        case "=":
+            return value == expected
+        case "*=":
+            return bool(expected) and expected in value
+        case "^=":
+            return bool(expected) and value.startswith(expected)
+        case "$=":
+            return bool(expected) and value.endswith(expected)
+        case "~=":
+            return expected in value.split()
+        case "|=":
+            return value == expected or value.startswith(f"{expected}-")
+    return False
+
+
+class SelectorStrainer(SoupStrainer):
+    # keeps only the subtrees that the given css selectors can match in
+    def __init__(self, rules):
+        self.rules = rules
+        # bs4 < 4.13 calls name(tag_name, attrs) while parsing
+        super().__init__(name=self.allows)
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        return self.allows(name, attrs)
+
+    def allows(self, name, attrs=None):
+        attrs = dict(attrs or {})
+        for rule in self.rules:
+            if rule["tag"] and rule["tag"] != str(name).lower():
+                continue
+            if rule["id"] and attrs.get("id") != rule["id"]:
+                continue
+            classes = attrs.get("class") or []
+            if isinstance(classes, str):
+                classes = classes.split()
+            if any(cls not in classes for cls in rule["classes"]):
+                continue
+            if all(
+                _attribute_matches(attrs.get(attr), op, value)
+                for attr, op, value in rule["attrs"]
+            ):
+                return True
+        return False
+
+
+@functools.lru_cache(maxsize=128)
+def selector_strainer(selectors: tuple):
+    # selectors: ((parent_selector, selector), ...), None when a full parse is needed
+    rules = []
+    for parent_selector, selector in selectors:
+        for group in _split_selector_list(parent_selector or selector or ""):
+            compound = _root_compound(group)
+            rule = _compound_rule(compound) if compound else None
+            if not rule:
+                logging.debug(f"Selector {group} needs the whole document")
+                return None
+            rules.append(rule)
+    return SelectorStrainer(rules) if rules else None
+
+
+def resolve_html_parser(preferred=None):
+    # first tree builder that is installed, html.parser always is
+    for name in (preferred, "lxml", "html.parser"):
+        if name and builder_registry.lookup(name):
+            return name
+    return "html.parser"
+
 
 class UrlParser:
+    html_parser = resolve_html_parser()
+
     __slots__ = (
         "url",
         "expected_status_code",
@@ -15,12 +210,30 @@ class UrlParser:
         "max_retries",
         "default_max_page",
         "timeout",
-        "api_limit_delay",
         "max_child_depth",
+        "http_client",
+        "page_kind",
+        "selectors",
     )
 
-    def __init__(self, url, expected_status_code=200, max_retries=3, timeout=3):
+    def __init__(
+        self,
+        url,
+        expected_status_code=200,
+        max_retries=3,
+        timeout=3,
+        http_client=None,
+        load=True,
+        page_kind="listing",
+        selectors=None,
+    ):
         self.url = url
+        self.http_client = http_client or default_http_client
+        # "listing" or "article", picks the response cache ttl
+        self.page_kind = page_kind
+        # (parent_selector, selector) pairs this page will be queried with,
+        # when given only the parts of the page they can match are parsed
+        self.selectors = tuple(selectors) if selectors else None
         self.expected_status_code = expected_status_code
         self.max_page_limits = {
             "www.ft.com": 40,
@@ -30,31 +243,81 @@ class UrlParser:
         self.max_retries = max_retries
         self.default_max_page = 20
         self.timeout = timeout
-        self.api_limit_delay = 30
-        self.soup = self._load()
+        self.soup = self._load() if load else None
         self.max_child_depth = 5
 
+    @classmethod
+    def set_html_parser(cls, preferred):
+        cls.html_parser = resolve_html_parser(preferred)
+        if preferred and cls.html_parser != preferred:
+            logging.warning(
+                f"HTML parser {preferred} is not installed, using {cls.html_parser}"
+            )
+        logging.info(f"Using {cls.html_parser} to parse html pages")
+
+    @classmethod
+    def load_many(cls, urls, http_client=None, kill_thread=None, **kwargs):
+        http_client = http_client or default_http_client
+        if http_client.async_fetcher:
+            # every url is in flight at once on the fetcher's event loop
+            responses = http_client.fetch_many(
+                urls,
+                page_kind=kwargs.get("page_kind", "listing"),
+                timeout=kwargs.get("timeout", 3),
+                max_retries=kwargs.get("max_retries", 3),
+                expected_status_code=kwargs.get("expected_status_code", 200),
+                kill_thread=kill_thread,
+            )
+            parsers = []
+            for url, response in zip(urls, responses):
+                url_parser = cls(url, http_client=http_client, load=False, **kwargs)
+                url_parser.soup = url_parser._parse_response(response)
+                parsers.append(url_parser)
+            return parsers
+
+        def load(url):
+            if kill_thread:
+                return None
+            return cls(url, http_client=http_client, **kwargs)
+
+        return http_client.map(load, urls)
+
+    def _parse_response(self, response):
+        if response is None:
+            return None
+        if response.status_code != self.expected_status_code:
+            logging.error(f"Invalid status_code: {response.status_code} for {self.url}")
+            return None
+        try:
+            return self._make_soup(response)
+        except Exception as e:
+            logging.error(f"Error while parsing response of {self.url}: {e}")
+            return None
+
+    def _make_soup(self, response):
+        if "application/json" in response.headers.get("Content-Type"):
+            # selectors are answered straight from the decoded json
+            return JsonDocument(response.json())
+        parse_only = selector_strainer(self.selectors) if self.selectors else None
+        return BeautifulSoup(response.text, self.html_parser, parse_only=parse_only)
+
     def _load(self):
         retries = 0
         extended_timeout = 0
         while retries < self.max_retries:
             try:
-                response = requests.get(
-                    self.url, timeout=self.timeout + extended_timeout
+                response = self.http_client.get(
+                    self.url,
+                    page_kind=self.page_kind,
+                    timeout=self.timeout + extended_timeout,
                 )
                 if response.status_code == self.expected_status_code:
-                    if "application/json" in response.headers.get("Content-Type"):
-                        html_output = self._json_to_html(response.json())
-                        soup = BeautifulSoup(html_output, "html.parser")
-                    else:
-                        soup = BeautifulSoup(response.text, "html.parser")
-                    return soup 
-                elif response.status_code in (429, 502):
+                    return self._make_soup(response)
+                elif response.status_code in THROTTLE_STATUS_CODES:
+                    # the shared rate limiter delays the retry for this host
                     logging.warning(
-                        f"Retrying after {self.api_limit_delay} seconds ({retries}/{self.max_retries})"
+                        f"Throttled with {response.status_code}, retrying ({retries}/{self.max_retries})"
                     )
-                    time.sleep(self.api_limit_delay)
-                    self.api_limit_delay *= 5
                     retries += 1
                     continue
                 else:
@@ -65,9 +328,6 @@ class UrlParser:
 
             except Exception as e:
                 logging.error(str(e))
-                logging.info(f"will retry after: {self.api_limit_delay} seconds...")
-                # time.sleep(self.api_limit_delay)
-                # self.api_limit_delay *= 5
 
             retries += 1
             extended_timeout += 4
@@ -192,32 +452,6 @@ class UrlParser:
             current_page += 1
         logging.debug(f"Breaking pagination url generation on {current_page}")
 
-    def _json_to_html(self,json_data):
-        html = '<ul>'  # Start with an unordered list
-
-        for key, value in json_data.items():
-            html += f'<{key}>'
-            if isinstance(value, dict):  # If the value is a dictionary, recursively convert it
-                html += self._json_to_html(value)
-            elif isinstance(value, list):  # If the value is a list, iterate over its items
-                html += f'<ul>'
-                for item in value:
-                    if isinstance(item, dict):  # If an item is a dictionary, recursively convert it
-                        html += self._json_to_html(item)
-                    elif isinstance(item, list):  # If an item is a list, recursively convert it
-                        html += self._json_to_html({"list_item": item})
-                    else:
-                        html += f'<li>{value}</li>'
-                html += '</ul>'
-            else:  # Otherwise, just add the value
-                html += f'{value}'
-                # html += str(value)
-
-            html += f'</{key}>'
-
-        html += '</ul>'
-        return html
-
     def get_from_selector(self, parent_selector=None, selector=None, get="text"):
         if parent_selector:
             parent = self.soup.select(parent_selector)
@@ -371,29 +605,88 @@ class UrlParser:
             )
             max_page = self.max_page_limits[urlparse(self.url).netloc]
 
-        return self._generate_next_urls(next_page_url, max_page=max_page)
+        return Paginator(self, next_page_url, max_page=max_page)
+
+
+class Paginator:
+    # iterable of (page, url), pages start at start_page, which a date seek
+    # may move forward before iterating
+    def __init__(self, url_parser: UrlParser, next_page_url, max_page):
+        self.url_parser = url_parser
+        self.next_page_url = next_page_url
+        self.max_page = max_page
+        self.start_page = 1
+
+    def page_url(self, page):
+        for _, url in self.url_parser._generate_next_urls(
+            self.next_page_url, current_page=page, max_page=page
+        ):
+            return url
+
+    def __iter__(self):
+        return self.url_parser._generate_next_urls(
+            self.next_page_url, current_page=self.start_page, max_page=self.max_page
+        )
+
+
+class PrefetchingPaginator:
+    # iterable of (page, url, future UrlParser), the next `depth` listing pages
+    # are fetched and parsed in the background while the current one is processed
+    def __init__(self, paginator, depth=2, **url_parser_kwargs):
+        self.paginator = paginator
+        self.depth = depth
+        self.url_parser_kwargs = url_parser_kwargs
+        self.executor = ThreadPoolExecutor(max_workers=depth + 1)
+        self.pending = deque()
+
+    def __iter__(self):
+        try:
+            for page, url in self.paginator:
+                self.pending.append(
+                    (page, url, self.executor.submit(UrlParser, url, **self.url_parser_kwargs))
+                )
+                if len(self.pending) > self.depth:
+                    yield self.pending.popleft()
+            while self.pending:
+                yield self.pending.popleft()
+        finally:
+            self.close()
+
+    def close(self):
+        # pages that have not started are dropped, running ones finish unused
+        for page, url, future in self.pending:
+            if future.cancel():
+                logging.debug(f"Cancelled prefetch of page {page}: {url}")
+        self.pending.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
 
 class XMLParser:
-    def __init__(self, url, max_retries=3, retry_delay=1):
+    def __init__(
+        self, url, max_retries=3, retry_delay=1, http_client=None, parse=True, timeout=30
+    ):
         self.url = url
+        self.timeout = timeout
+        self.http_client = http_client or default_http_client
         self.max_retries = max_retries
         self.retry_delay = retry_delay
         self.root_element = None  # Initialize root element attribute
-        self.fetch_and_parse()
+        self.content = None
+        if parse:
+            self.fetch_and_parse()
 
-    def fetch_and_parse(self):
+    def fetch(self):
         retries = 0
         while retries < self.max_retries:
             try:
-                response = requests.get(self.url)
+                response = self.http_client.get(self.url)
                 if response.status_code == 200:
-                    xml_data = response.content
-                    self.root_element = ET.fromstring(xml_data)
-                    return self.root_element
+                    self.content = response.content
+                    return self.content
                 else:
                     print(f"Failed to fetch XML from {self.url}. Status code: {response.status_code}")
                     return None
-            except requests.RequestException as e:
+            except Exception as e:
                 print(f"Error fetching XML from {self.url}: {e}")
                 retries += 1
                 if retries < self.max_retries:
@@ -402,6 +695,66 @@ class XMLParser:
         print(f"Maximum retries ({self.max_retries}) reached. Unable to fetch XML from {self.url}.")
         return None
 
+    def fetch_and_parse(self):
+        xml_data = self.fetch()
+        if xml_data is None:
+            return None
+        self.root_element = ET.fromstring(xml_data)
+        self.content = None
+        return self.root_element
+
+    def download(self, fp, chunk_size=64 * 1024) -> bool:
+        # streams the document into fp, a failed attempt is retried from the start
+        retries = 0
+        while retries < self.max_retries:
+            try:
+                fp.seek(0)
+                fp.truncate()
+                with self.http_client.stream(self.url, timeout=self.timeout) as response:
+                    if response.status_code != 200:
+                        print(f"Failed to fetch XML from {self.url}. Status code: {response.status_code}")
+                        return False
+                    for chunk in response.iter_content(chunk_size):
+                        fp.write(chunk)
+                fp.seek(0)
+                return True
+            except Exception as e:
+                print(f"Error fetching XML from {self.url}: {e}")
+                retries += 1
+                if retries < self.max_retries:
+                    print(f"Retrying in {self.retry_delay} seconds...")
+                    time.sleep(self.retry_delay)
+        print(f"Maximum retries ({self.max_retries}) reached. Unable to fetch XML from {self.url}.")
+        return False
+
+    def iter_elements(self, tag_name, chunk_size=64 * 1024):
+        # the document is spooled to a temp file, then parsed incrementally with each
+        # element removed from the tree once the caller moves on, so memory stays
+        # flat and no connection is held open while the caller works on elements
+        if self.content is not None:
+            source = io.BytesIO(self.content)
+            self.content = None
+        else:
+            source = tempfile.TemporaryFile()
+            if not self.download(source, chunk_size):
+                source.close()
+                return
+        parents = []
+        try:
+            for event, elem in ET.iterparse(source, events=("start", "end")):
+                if event == "start":
+                    parents.append(elem)
+                    continue
+                parents.pop()
+                if elem.tag != tag_name:
+                    continue
+                yield elem
+                elem.clear()
+                if parents:
+                    parents[-1].remove(elem)
+        finally:
+            source.close()
+
     def get_tag_data(self, tag_name):
         if self.root_element is None:
             self.fetch_and_parse()  # Ensure root element is fetched before accessing